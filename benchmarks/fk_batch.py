@@ -0,0 +1,35 @@
+"""Compare batched forward kinematics with a loop of single solves."""
+
+import time
+
+import numpy as np
+
+import tinyik
+
+
+def measure(f, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(n=2000, dof=6):
+    tokens = []
+    for axis in ('z', 'y', 'x') * (dof // 3) + ('z', 'y', 'x')[:dof % 3]:
+        tokens += [axis, [1., 0., 0.]]
+    arm = tinyik.Actuator(tokens)
+    angles = np.random.RandomState(0).uniform(-np.pi, np.pi, (n, dof))
+
+    loop = measure(lambda: [arm.fk.solve(a) for a in angles])
+    batch = measure(lambda: arm.fk.solve_batch(angles))
+    print('{} poses, {} joints'.format(n, dof))
+    print('solve loop:  {:12.0f} poses/s'.format(n / loop))
+    print('solve_batch: {:12.0f} poses/s ({:.1f}x)'.format(
+        n / batch, loop / batch))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Measure the startup time of processes using tinyik in different ways.
+
+Each snippet runs in a fresh interpreter, and the best of several runs is
+reported along with the heavy dependencies it loaded. The eager imports row
+is what importing tinyik cost when it loaded autograd and scipy up front.
+"""
+
+import subprocess
+import sys
+import time
+
+
+snippets = [
+    ('numpy only', 'import numpy'),
+    ('eager imports', 'import numpy, autograd.numpy, scipy.optimize'),
+    ('import tinyik', 'import tinyik'),
+    ('forward kinematics',
+     'import tinyik; tinyik.Actuator(["z", 1., "z", 1.]).ee'),
+    ('damped least squares',
+     'import tinyik; a = tinyik.Actuator(["z", 1., "z", 1.], '
+     'optimizer=tinyik.DampedLeastSquaresOptimizer()); a.ee = [1., 1., 0.]'),
+    ('scipy optimizer',
+     'import tinyik; a = tinyik.Actuator(["z", 1., "z", 1.]); '
+     'a.ee = [1., 1., 0.]'),
+]
+
+report = (
+    '; import sys; print(",".join(m for m in ("autograd", "scipy", "open3d")'
+    ' if m in sys.modules))')
+
+
+def measure(code, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, '-c', code + report], check=True,
+            stdout=subprocess.PIPE, universal_newlines=True).stdout
+        best = min(best, time.perf_counter() - start)
+    return best, out.strip()
+
+
+def main():
+    for name, code in snippets:
+        seconds, modules = measure(code)
+        print('{:22s} {:8.1f} ms  {}'.format(
+            name, seconds * 1e3, modules or '-'))
+
+
+if __name__ == '__main__':
+    main()
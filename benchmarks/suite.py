@@ -0,0 +1,182 @@
+"""Benchmark FK and IK solvers over chain lengths and target difficulty.
+
+Each record of the JSON output is for a solver, a number of joints and a
+kind of targets (reachable, boundary or unreachable), with solves per
+second, mean iterations, success rate and peak memory per solve. Runs are
+reproducible for a given seed, so outputs of two releases can be diffed:
+
+    $ python benchmarks/suite.py --dofs 2 10 50 --output bench.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import tinyik
+
+
+def build_components(dof):
+    """Build a chain of dof joints whose links add up to unit length."""
+    components = []
+    for i in range(dof):
+        components += [tinyik.Joint('zyx'[i % 3]),
+                       tinyik.Link([1. / dof, 0., 0.])]
+    return components
+
+
+def build_targets(fk, kind, n, rs):
+    """Draw n targets of a kind for a chain of unit reach."""
+    if kind == 'reachable':
+        return fk.solve_batch(
+            rs.uniform(-np.pi, np.pi, (n, len(fk.joint_indexes))))
+    directions = rs.normal(size=(n, 3))
+    directions /= np.linalg.norm(directions, axis=1)[:, None]
+    return directions * {'boundary': .999, 'unreachable': 1.5}[kind]
+
+
+def ik_solvers():
+    """Return factories of IK solvers by name."""
+    def optimizer_solver(optimizer):
+        return lambda c: tinyik.IKSolver(tinyik.FKSolver(c), optimizer())
+
+    return {
+        'ccd': lambda c: tinyik.CCDIKSolver(tinyik.CCDFKSolver(c)),
+        'fabrik': lambda c: tinyik.FABRIKSolver(tinyik.FKSolver(c)),
+        'newton': optimizer_solver(tinyik.NewtonOptimizer),
+        'steepest_descent': optimizer_solver(
+            lambda: tinyik.SteepestDescentOptimizer(alpha=.1)),
+        'conjugate_gradient': optimizer_solver(
+            tinyik.ConjugateGradientOptimizer),
+        'damped_least_squares': optimizer_solver(
+            tinyik.DampedLeastSquaresOptimizer),
+        'scipy': optimizer_solver(tinyik.ScipyOptimizer),
+        'scipy_smooth': optimizer_solver(tinyik.ScipySmoothOptimizer),
+    }
+
+
+def measure(run):
+    """Time run after a warm-up call and measure its peak memory apart.
+
+    The warm-up keeps lazy imports and first-call allocations out of the
+    timing, and memory is traced in another call, since tracing slows down
+    allocations. It returns the seconds per call and the peak bytes.
+    """
+    run()
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_fk(dof, n, rs):
+    """Measure FKSolver.solve and FKSolver.solve_batch."""
+    fk = tinyik.FKSolver(build_components(dof))
+    angles = rs.uniform(-np.pi, np.pi, (n, dof))
+    records = []
+    for name, run in [
+            ('fk', lambda: [fk.solve(a) for a in angles]),
+            ('fk_batch', lambda: fk.solve_batch(angles))]:
+        elapsed, peak = measure(run)
+        records.append({
+            'solver': name, 'dof': dof, 'targets': 'random', 'n': n,
+            'solves_per_sec': n / elapsed,
+            'peak_bytes_per_solve': peak / n})
+    return records
+
+
+def bench_ik(name, factory, dof, kind, n, rs, tol):
+    """Solve n targets of a kind from zero angles and measure them."""
+    components = build_components(dof)
+    solver = factory(components)
+    fk = tinyik.FKSolver(components)
+    targets = build_targets(fk, kind, n, rs)
+    solver.solve(np.zeros(dof), targets[0])  # warm-up, untimed
+
+    iterations = []
+    solver_stats = solver if hasattr(solver, 'add_hook') else solver.optimizer
+
+    def hook(stats):
+        iterations.append(stats.iterations)
+
+    solver_stats.add_hook(hook)
+    successes = 0
+    elapsed = 0.
+    for target in targets:
+        start = time.perf_counter()
+        angles = solver.solve(np.zeros(dof), target)
+        elapsed += time.perf_counter() - start
+        successes += np.linalg.norm(fk.solve(angles) - target) < tol
+    solver_stats.remove_hook(hook)
+
+    # Memory is traced in a pass of its own, which tracing slows down.
+    peak = 0
+    for target in targets:
+        tracemalloc.start()
+        solver.solve(np.zeros(dof), target)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        'solver': name, 'dof': dof, 'targets': kind, 'n': n,
+        'solves_per_sec': n / elapsed,
+        'mean_iterations': float(np.mean(iterations)),
+        'success_rate': successes / n,
+        'peak_bytes_per_solve': peak}
+
+
+def run(dofs=(2, 6, 10, 20, 50),
+        kinds=('reachable', 'boundary', 'unreachable'),
+        solvers=None, n=20, seed=0, tol=1e-4):
+    """Run the benchmarks and return their records."""
+    factories = ik_solvers()
+    records = []
+    for dof in dofs:
+        records += bench_fk(dof, n * 50, np.random.RandomState(seed))
+        for name in solvers or sorted(factories):
+            for kind in kinds:
+                records.append(bench_ik(
+                    name, factories[name], dof, kind, n,
+                    np.random.RandomState(seed), tol))
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dofs', type=int, nargs='+',
+                        default=[2, 6, 10, 20, 50])
+    parser.add_argument('--kinds', nargs='+',
+                        default=['reachable', 'boundary', 'unreachable'])
+    parser.add_argument('--solvers', nargs='+',
+                        choices=sorted(ik_solvers()))
+    parser.add_argument('-n', type=int, default=20,
+                        help='targets per case')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tol', type=float, default=1e-4,
+                        help='distance counted as a success')
+    parser.add_argument('--output', help='file to write instead of stdout')
+    args = parser.parse_args(argv)
+
+    report = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'args': vars(args),
+        'records': run(args.dofs, args.kinds, args.solvers, args.n,
+                       args.seed, args.tol),
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from tinyik import Actuator, AsyncIKSolver, IKSolver, Workspace
+
+from .utils import x, y, z, theta, approx_eq
+
+
+def test_async_ik_solver():
+    arm = Actuator(['z', 1., 'y', 1.])
+    batches = []
+    solve_many = arm.ik.solve_many
+
+    def counting_solve_many(targets, angles0):
+        batches.append(len(targets))
+        return solve_many(targets, angles0)
+
+    arm.ik.solve_many = counting_solve_many
+    solver = AsyncIKSolver(arm.ik, window=.01)
+
+    async def solve_all():
+        return await asyncio.gather(*[
+            solver.solve(t, [0., 0.])
+            for t in [[x, y, -z], [x, -y, z]] * 10])
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(solve_all())
+    finally:
+        loop.close()
+    assert len(results) == 20
+    for angles, expected in zip(
+            results, [[theta, theta], [-theta, -theta]] * 10):
+        assert approx_eq(angles, expected)
+    assert sum(batches) == 20
+    assert len(batches) < 20
+
+
+def test_async_ik_solver_unreachable():
+    arm = Actuator(['z', 1., 'y', 1.])
+    ik = IKSolver(arm.fk, arm.ik.optimizer,
+                  workspace=Workspace.sample(arm.fk, .25, samples=500,
+                                             random_state=0))
+    solver = AsyncIKSolver(ik, window=.01)
+
+    async def solve(target):
+        return await solver.solve(target, [0., 0.])
+
+    loop = asyncio.new_event_loop()
+    try:
+        with pytest.raises(ValueError):
+            loop.run_until_complete(solve([5., 0., 0.]))
+        angles = loop.run_until_complete(solve([x, y, -z]))
+    finally:
+        loop.close()
+    assert approx_eq(angles, [theta, theta])
@@ -0,0 +1,62 @@
+import numpy as np
+
+from tinyik import (
+    Link, Joint, FKSolver, IKSolver, ScipyOptimizer, SolutionCache
+)
+
+from .utils import x, y, z, theta, approx_eq
+
+
+def test_solution_cache():
+    cache = SolutionCache(maxsize=2, radius=.5)
+    cache.put(b'a', [0., 0., 0.], [1., 2.])
+    cache.put(b'b', [1., 0., 0.], [3., 4.])
+    assert approx_eq(cache.get(b'a'), [1., 2.])
+    assert cache.get(b'c') is None
+    assert approx_eq(cache.nearest([.9, .1, 0.]), [3., 4.])
+    assert cache.nearest([3., 0., 0.]) is None
+    cache.put(b'c', [2., 0., 0.], [5., 6.])  # evicts b
+    assert len(cache) == 2
+    assert cache.get(b'b') is None
+    assert approx_eq(cache.nearest([.4, .1, 0.]), [1., 2.])
+    assert (cache.hits, cache.near_hits, cache.misses) == (1, 0, 1)
+
+
+def test_inverse_kinematics_with_cache():
+    fk = FKSolver([
+        Joint('z'), Link([1., 0., 0.]), Joint('y'), Link([1., 0., 0.])
+    ])
+    cache = SolutionCache(radius=.2)
+    ik = IKSolver(fk, ScipyOptimizer(), cache=cache)
+    assert approx_eq(ik.solve([0., 0.], [x, y, -z]), [theta, theta])
+    reported = []
+    ik.optimizer.add_hook(reported.append)
+    assert approx_eq(ik.solve([0., 0.], [x, y, -z]), [theta, theta])
+    assert (cache.hits, cache.near_hits, cache.misses) == (1, 0, 1)
+    assert reported == [ik.stats]
+    assert (ik.stats.status, ik.stats.iterations) == ('cache', 0)
+    assert ik.stats.success and ik.stats.residual < ik.tol
+
+    target = fk.solve([theta + .05, theta])
+    assert approx_eq(ik.solve([0., 0.], target), [theta + .05, theta])
+    assert cache.near_hits == 1
+
+    ik.solve([0., 0.], [5., 0., 0.])  # unreachable, not cached
+    assert len(cache) == 2
+    assert np.allclose(
+        ik.solve_many([[x, y, -z]], warm_start=False)[0], [[theta, theta]])
+    assert cache.hits == 2
+
+
+def test_inverse_kinematics_keeps_closer_start():
+    fk = FKSolver([
+        Joint('z'), Link([1., 0., 0.]), Joint('z'), Link([1., 0., 0.])
+    ])
+    cache = SolutionCache(radius=.25)
+    ik = IKSolver(fk, ScipyOptimizer(), cache=cache)
+    # The other elbow branch, near the target but farther than the start.
+    cache.put(b'other', fk.solve([1.5, -1.32]), [1.5, -1.32])
+    angles = ik.solve([.2, 1.], [1.22, 1., 0.])
+    assert cache.near_hits == 0
+    assert angles[1] > 0.
+    assert ik.error(angles, [1.22, 1., 0.]) < ik.tol
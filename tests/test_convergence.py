@@ -0,0 +1,92 @@
+import numpy as np
+
+from tinyik import (
+    Link, Joint, FKSolver, IKSolver, CCDFKSolver, CCDIKSolver,
+    NewtonOptimizer, SteepestDescentOptimizer, ConjugateGradientOptimizer,
+    DampedLeastSquaresOptimizer, NullSpaceOptimizer, ScipyOptimizer,
+    ScipySmoothOptimizer, ConvergencePolicy
+)
+
+from .utils import x, y, z
+
+
+components = [Joint('z'), Link([1., 0., 0.]), Joint('y'), Link([1., 0., 0.])]
+
+
+def optimizers(policy):
+    return [
+        NewtonOptimizer(policy=policy),
+        SteepestDescentOptimizer(maxiter=100, alpha=0.1, policy=policy),
+        ConjugateGradientOptimizer(policy=policy),
+        DampedLeastSquaresOptimizer(policy=policy),
+        NullSpaceOptimizer(policy=policy),
+        ScipyOptimizer(policy=policy),
+        ScipySmoothOptimizer(smooth_factor=0., policy=policy)]
+
+
+def test_residual_tol():
+    policy = ConvergencePolicy(residual_tol=1e-2)
+    for optimizer in optimizers(policy):
+        ik = IKSolver(FKSolver(components), optimizer)
+        ik.solve([0., 0.], [x, y, -z])
+        assert ik.stats.status == 'residual' and ik.stats.success
+        assert ik.stats.residual <= 1e-2
+
+    ik = CCDIKSolver(CCDFKSolver(components), policy=policy)
+    ik.solve([0., 0.], [x, y, -z])
+    assert ik.stats.status == 'residual' and ik.stats.success
+    assert ik.stats.residual <= 1e-2
+
+
+def test_residual_tol_saves_iterations():
+    def iterations(policy):
+        ik = IKSolver(FKSolver(components),
+                      DampedLeastSquaresOptimizer(policy=policy))
+        ik.solve([0., 0.], [x, y, -z])
+        return ik.stats.iterations
+
+    assert (iterations(ConvergencePolicy(residual_tol=1e-4)) <
+            iterations(None))
+
+
+def test_stall():
+    # The target is out of reach, so the residual stops decreasing.
+    policy = ConvergencePolicy(stall_iterations=3, stall_tol=1e-6)
+    for optimizer in [DampedLeastSquaresOptimizer(tol=0., maxiter=1000,
+                                                  policy=policy),
+                      ScipyOptimizer(policy=policy, tol=0.,
+                                     options={'maxiter': 1000})]:
+        ik = IKSolver(FKSolver(components), optimizer)
+        ik.solve([.5, .5], [3., 0., 0.])
+        assert ik.stats.status == 'stall' and not ik.stats.success
+        assert ik.stats.residual > .9
+
+    ik = CCDIKSolver(CCDFKSolver(components), tol=-np.inf, maxiter=1000,
+                     policy=policy)
+    ik.solve([.5, .5], [3., 0., 0.])
+    assert ik.stats.status == 'stall'
+
+
+def test_budget():
+    policy = ConvergencePolicy(max_evaluations=3)
+    for optimizer in optimizers(policy):
+        ik = IKSolver(FKSolver(components), optimizer)
+        ik.solve([0., 0.], [x, y, -z])
+        assert ik.stats.status == 'budget' and not ik.stats.success
+
+    ik = CCDIKSolver(CCDFKSolver(components), tol=-np.inf, policy=policy)
+    ik.solve([0., 0.], [x, y, -z])
+    assert ik.stats.status == 'budget'
+
+
+def test_timeout():
+    policy = ConvergencePolicy(timeout=0.)
+    for optimizer in optimizers(policy):
+        ik = IKSolver(FKSolver(components), optimizer)
+        angles = ik.solve([0., 0.], [x, y, -z])
+        assert ik.stats.status == 'deadline'
+        assert np.all(np.isfinite(angles))
+
+    ik = CCDIKSolver(CCDFKSolver(components), policy=policy)
+    ik.solve([0., 0.], [x, y, -z])
+    assert ik.stats.status == 'deadline' and ik.stats.iterations == 0
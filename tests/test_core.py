@@ -1,4 +1,10 @@
-from tinyik import Actuator
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from tinyik import Actuator, Link, Joint, DampedLeastSquaresOptimizer
 
 from .utils import x, y, z, theta, approx_eq
 
@@ -24,6 +30,12 @@ def test_actuator_angles():
     assert approx_eq(arm.angles, [theta, theta])
     assert approx_eq(arm.ee, [x, y, -z])
 
+    view = arm.angles
+    with pytest.raises(ValueError):
+        view[0] = 0.
+    arm.angles = [0., 0.]
+    assert approx_eq(view, [0., 0.])  # follows the buffer
+
 
 def test_actuator_ee():
     arm = Actuator(['z', 1., 'y', 1.])
@@ -44,3 +56,78 @@ def test_multiple_actuator_ee():
     first_arm.ee = first_arm.ee + [0., 0., 0.]
     assert approx_eq(first_arm.angles, angles)
     assert approx_eq(second_arm.angles, [0., 0., 0.])
+
+
+def test_actuator_optimizer():
+    arm = Actuator(['z', 1., 'y', 1.], optimizer=DampedLeastSquaresOptimizer())
+    arm.ee = [x, -y, z]
+    assert approx_eq(arm.ee, [x, -y, z])
+    assert approx_eq(arm.angles, [-theta, -theta])
+
+
+def test_actuator_fabrik():
+    arm = Actuator(['z', 1., 'y', 1.], solver='fabrik')
+    arm.ee = [x, -y, z]
+    assert approx_eq(arm.ee, [x, -y, z])
+    assert approx_eq(arm.angles, [-theta, -theta])
+    with pytest.raises(ValueError):
+        Actuator(['z', 1.], optimizer=DampedLeastSquaresOptimizer(),
+                 solver='fabrik')
+
+
+def test_actuator_limits():
+    arm = Actuator(['z', 1., Joint('y', limits=(-.1, None)), 1.])
+    lower, upper = arm.limits
+    assert lower[0] == -np.inf and lower[1] == -.1
+    assert upper[0] == np.inf and upper[1] == np.inf
+    arm.ee = [x, -y, z]
+    assert arm.angles[1] >= -.1
+
+
+def test_actuator_track():
+    arm = Actuator(['z', 1., 'y', 1.], optimizer=DampedLeastSquaresOptimizer())
+    targets = [[x, y, -z], [x, -y, z]]
+    results = list(arm.track(targets))
+    assert len(results) == 2
+    assert approx_eq(results[0][0], [theta, theta])
+    assert approx_eq(results[1][0], [-theta, -theta])
+    assert all(converged for _, converged in results)
+
+    arm.angles = [0., 0.]
+    angles, converged = next(arm.track([[x, y, -z]], maxiter=1))
+    assert not converged
+    assert approx_eq(arm.angles, angles)
+
+    arm.angles = [0., 0.]
+    angles, converged = next(arm.track([[x, y, -z]], timeout=0.))
+    assert not converged
+    assert approx_eq(angles, [0., 0.])
+
+
+def test_actuator_float32():
+    arm = Actuator(['z', 1., 'y', 1.], dtype=np.float32)
+    buffer = arm._angles
+    assert arm.angles.dtype == np.float32
+    assert arm.fk.chain.buffer.dtype == np.float32
+    assert arm.fk.chain.constants.base is not None
+    assert arm.ee.dtype == np.float32
+    arm.ee = [x, -y, z]
+    assert arm._angles is buffer  # updated in place
+    assert np.allclose(arm.ee, [x, -y, z], atol=1e-4)
+    assert np.allclose(arm.angles, [-theta, -theta], atol=1e-4)
+
+    assert not hasattr(Link([1., 0., 0.]), '__dict__')
+    assert not hasattr(Joint('z'), '__dict__')
+
+
+def test_lazy_imports():
+    code = (
+        'import sys, tinyik; '
+        'arm = tinyik.Actuator(["z", 1., "z", 1.], '
+        'optimizer=tinyik.DampedLeastSquaresOptimizer()); '
+        'arm.ee = [1., 1., 0.]; '
+        'print(any(m in sys.modules for m in ("autograd", "scipy", "open3d")))'
+    )
+    out = subprocess.run([sys.executable, '-c', code], check=True,
+                         stdout=subprocess.PIPE, universal_newlines=True)
+    assert out.stdout.strip() == 'False'
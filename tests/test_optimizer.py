@@ -1,4 +1,5 @@
 import numpy as np
+import pytest
 
 from tinyik import (
     Link, Joint,
@@ -6,6 +7,7 @@ from tinyik import (
     NewtonOptimizer,
     SteepestDescentOptimizer,
     ConjugateGradientOptimizer,
+    DampedLeastSquaresOptimizer, NullSpaceOptimizer,
     ScipyOptimizer, ScipySmoothOptimizer
 )
 
@@ -40,6 +42,19 @@ def test_inverse_kinematics_with_conjugate_gradient():
     assert approx_eq(ik.solve([0., 0.], [x, -y, z]), [-theta, -theta])
 
 
+def test_inverse_kinematics_with_damped_least_squares():
+    ik = build_ik_solver(DampedLeastSquaresOptimizer())
+    assert approx_eq(ik.solve([theta, theta], [2., 0., 0.]), [0., 0.])
+    assert approx_eq(ik.solve([0., 0.], [x, y, -z]), [theta, theta])
+    assert approx_eq(ik.solve([0., 0.], [x, -y, z]), [-theta, -theta])
+
+    optimizer = DampedLeastSquaresOptimizer(max_step=.1)
+    ik = build_ik_solver(optimizer)
+    angles = ik.solve([0., 0.], [3., 0., 0.])  # singular and unreachable
+    assert np.all(np.isfinite(angles))
+    assert np.linalg.norm(angles) <= optimizer.max_step * optimizer.maxiter
+
+
 def test_inverse_kinematics_with_scipy():
     ik = build_ik_solver(ScipyOptimizer())
     assert approx_eq(ik.solve([theta, theta], [2., 0., 0.]), [0., 0.])
@@ -60,3 +75,216 @@ def test_inverse_kinematics_with_scipy_smooth():
     assert approx_roughly_eq(ik.solve([theta, theta], [2., 0., 0.]), [0., 0.])
     assert approx_roughly_eq(ik.solve([0., 0.], [x, y, -z]), [theta, theta])
     assert approx_roughly_eq(ik.solve([0., 0.], [x, -y, z]), [-theta, -theta])
+
+
+def test_inverse_kinematics_with_scipy_gradient():
+    for optimizer in (ScipyOptimizer, ScipySmoothOptimizer):
+        analytic = build_ik_solver(optimizer())
+        numeric = build_ik_solver(optimizer(jac=None))
+        angles = analytic.solve([.1, .2], [x, y, -z])
+        assert analytic.stats.njev > 0
+        assert np.allclose(
+            angles, numeric.solve([.1, .2], [x, y, -z]), atol=1e-3)
+        assert analytic.stats.nfev < numeric.stats.nfev
+
+    ik = build_ik_solver(ScipySmoothOptimizer(smooth_factor=[.1, .1, .1]))
+    with pytest.raises(ValueError):
+        ik.solve([0., 0.], [x, y, -z])
+
+
+def test_inverse_kinematics_many():
+    ik = build_ik_solver(ScipyOptimizer())
+    targets = [[2., 0., 0.], [x, y, -z], [x, -y, z], [5., 0., 0.]]
+    angles, converged = ik.solve_many(targets)
+    assert angles.shape == (4, 2)
+    assert approx_eq(angles[0], [0., 0.])
+    assert approx_eq(angles[1], [theta, theta])
+    assert approx_eq(angles[2], [-theta, -theta])
+    assert list(converged) == [True, True, True, False]
+
+    angles, converged = ik.solve_many(
+        targets[1:3], angles0=[theta, theta], warm_start=False)
+    assert all(converged)
+    assert approx_eq(angles[1], [-theta, -theta])
+
+
+def test_inverse_kinematics_without_linearize():
+    fk = FKSolver([
+        Joint('z'), Link([1., 0., 0.]), Joint('y'), Link([1., 0., 0.])
+    ])
+    optimizer = NewtonOptimizer()
+    optimizer.prepare(
+        lambda angles, target: np.sum((target - fk.solve(angles)) ** 2))
+    assert approx_eq(optimizer.optimize(np.zeros(2), [x, y, -z]),
+                     [theta, theta])
+
+
+def test_inverse_kinematics_with_pose_targets():
+    fk = FKSolver([
+        Joint('z'), Link([1., 0., 0.]), Joint('y'), Link([1., 0., 0.]),
+        Joint('x'), Link([.5, 0., 0.]), Joint('y'), Link([.5, 0., 0.])
+    ])
+    angles = np.array([.3, -.4, .5, .6])
+    pose = fk.poses(angles, [-1])[0]
+    ik = IKSolver(fk, DampedLeastSquaresOptimizer())
+    assert np.allclose(fk.poses(ik.solve(np.zeros(4), pose), [-1])[0], pose)
+
+    w, v = np.cos(.25), np.sin(.25) * np.array([0., 0., 1.])
+    position = 3. * np.array([np.cos(.5), np.sin(.5), 0.])
+    angles = ik.solve([.1, .2, .1, -.1], (position, np.r_[w, v]))
+    assert np.allclose(fk.poses(angles, [-1])[0], [
+        [np.cos(.5), -np.sin(.5), 0., position[0]],
+        [np.sin(.5), np.cos(.5), 0., position[1]],
+        [0., 0., 1., 0.],
+        [0., 0., 0., 1.]], atol=1e-6)
+
+    wrist = fk.poses([.3, -.4, .5, .6], [3, -1])
+    ik = IKSolver(fk, DampedLeastSquaresOptimizer(), frames=[3, -1],
+                  weights=[2., 1.])
+    angles = ik.solve(np.zeros(4), [wrist[0][:3, 3], wrist[1][:3, 3]])
+    assert np.allclose(fk.poses(angles, [3, -1])[:, :3, 3],
+                       wrist[:, :3, 3])
+
+    angles, converged = IKSolver(fk, ScipyOptimizer()).solve_many(
+        [pose, (pose[:3, 3], pose[:3, :3])])
+    assert all(converged)
+
+
+def test_inverse_kinematics_multistart():
+    ik = build_ik_solver(SteepestDescentOptimizer(maxiter=100, alpha=0.1))
+    solve = ik.optimizer.optimize
+    calls = []
+
+    def counting_optimize(x0, target):
+        calls.append(x0)
+        return solve(x0, target)
+
+    ik.optimizer.optimize = counting_optimize
+    angles, residual = ik.solve_multistart(
+        [0., 0.], [x, y, -z], seeds=[[3., 3.], [theta, theta]])
+    assert approx_eq(angles, [theta, theta])
+    assert residual < ik.tol
+    assert len(calls) == 1 and approx_eq(calls[0], [theta, theta])
+
+    for strategy in ('random', 'stratified'):
+        calls = []
+        angles, residual = ik.solve_multistart(
+            [0., np.pi], [x, -y, z], starts=16, strategy=strategy,
+            random_state=0)
+        assert residual < ik.tol
+        assert len(calls) < 16
+
+
+def test_inverse_kinematics_with_joint_limits():
+    fk = FKSolver([
+        Joint('z', limits=(-np.pi, np.pi)), Link([1., 0., 0.]),
+        Joint('z', limits=(-np.pi, -.1)), Link([1., 0., 0.])
+    ])
+    assert np.allclose(fk.limits, [[-np.pi, -np.pi], [np.pi, -.1]])
+    for optimizer in [
+            NewtonOptimizer(),
+            SteepestDescentOptimizer(maxiter=200, alpha=.1),
+            ConjugateGradientOptimizer(),
+            DampedLeastSquaresOptimizer(),
+            ScipyOptimizer(),
+            ScipySmoothOptimizer(smooth_factor=0.)]:
+        ik = IKSolver(fk, optimizer)
+        angles = ik.solve([.3, -.2], [1., 1., 0.])
+        assert np.all(angles >= fk.limits[0])
+        assert np.all(angles <= fk.limits[1])
+        assert np.allclose(fk.solve(angles), [1., 1., 0.], atol=1e-4)
+
+    # The optimum is at both limits, where Newton steps lead outward.
+    fk = FKSolver([
+        Joint('z', limits=(0., .5)), Link([1., 0., 0.]),
+        Joint('z', limits=(None, .2)), Link([1., 0., 0.])
+    ])
+    for optimizer in [
+            NewtonOptimizer(),
+            SteepestDescentOptimizer(maxiter=200, alpha=.1),
+            ConjugateGradientOptimizer(),
+            DampedLeastSquaresOptimizer(),
+            ScipyOptimizer(),
+            ScipySmoothOptimizer(smooth_factor=0.)]:
+        ik = IKSolver(fk, optimizer)
+        angles = ik.solve([0., 0.], [0., 2., 0.])
+        assert np.allclose(angles, [.5, .2], atol=1e-4)
+
+
+def test_inverse_kinematics_with_budget():
+    for optimizer in [
+            NewtonOptimizer(),
+            DampedLeastSquaresOptimizer(),
+            ScipyOptimizer(),
+            ScipySmoothOptimizer(smooth_factor=0.)]:
+        ik = build_ik_solver(optimizer)
+        assert approx_eq(
+            ik.solve([0., 0.], [x, y, -z], deadline=0.), [0., 0.])
+        angles = ik.solve([0., 0.], [x, y, -z], maxiter=1)
+        assert ik.error(angles, [x, y, -z]) > ik.tol
+        assert ik.error(
+            ik.solve([0., 0.], [x, y, -z], maxiter=100), [x, y, -z]) < ik.tol
+
+
+def test_inverse_kinematics_with_null_space():
+    fk = FKSolver([
+        Joint('z'), Link([1., 0., 0.]),
+        Joint('z', limits=(-2., 2.)), Link([1., 0., 0.]),
+        Joint('z', limits=(-2.5, 1.5)), Link([1., 0., 0.])
+    ])
+    angles0 = np.zeros(3)
+    target = [2., 1., 0.]
+    dls = IKSolver(fk, DampedLeastSquaresOptimizer()).solve(angles0, target)
+
+    ik = IKSolver(fk, NullSpaceOptimizer(smooth_factor=.1))
+    angles = ik.solve(angles0, target)
+    assert ik.error(angles, target) < 1e-9
+    assert np.linalg.norm(angles) < np.linalg.norm(dls)
+
+    ik = IKSolver(fk, NullSpaceOptimizer(centering=1.))
+    angles = ik.solve(angles0, target)
+    assert ik.error(angles, target) < 1e-9
+    middle = np.array([0., -.5])
+    assert (np.linalg.norm(angles[1:] - middle) <
+            np.linalg.norm(dls[1:] - middle))
+
+    ik = IKSolver(fk, NullSpaceOptimizer(smooth_factor=[.1, .1]))
+    with pytest.raises(ValueError):
+        ik.solve(angles0, target)
+
+
+def test_null_space_keeps_target_first():
+    chain = []
+    for i in range(7):
+        chain += [Joint('zyx'[i % 3], limits=(-2., 2.)), Link([.3, 0., 0.])]
+    fk = FKSolver(chain)
+    rs = np.random.RandomState(0)
+    targets = fk.solve_batch(rs.uniform(-2., 2., (10, 7)))
+    for optimizer in [NullSpaceOptimizer(smooth_factor=1.),
+                      NullSpaceOptimizer(centering=1.)]:
+        ik = IKSolver(fk, optimizer)
+        for target in targets:
+            angles = ik.solve(np.zeros(7), target)
+            assert ik.stats.status == 'tol'
+            assert ik.error(angles, target) < 1e-9
+            ik.solve(np.zeros(7), target, maxiter=2)
+            assert ik.stats.iterations <= 2
+
+
+def test_inverse_kinematics_with_manipulability():
+    fk = FKSolver([
+        Joint('z'), Link([.5, 0., 0.]), Joint('y'), Link([.5, 0., 0.]),
+        Joint('x'), Joint('y'), Link([.5, 0., 0.]), Joint('z'),
+        Link([.5, 0., 0.])
+    ])
+    angles0 = np.full(5, .1)
+    target = [1., .8, .5]
+
+    def manipulability(angles):
+        return np.prod(np.linalg.svd(fk.jacobian(angles), compute_uv=False))
+
+    dls = IKSolver(fk, DampedLeastSquaresOptimizer()).solve(angles0, target)
+    ik = IKSolver(fk, NullSpaceOptimizer(manipulability=5.))
+    angles = ik.solve(angles0, target)
+    assert ik.error(angles, target) < 1e-9
+    assert manipulability(angles) > manipulability(dls)
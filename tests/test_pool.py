@@ -0,0 +1,53 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from tinyik import Actuator, IKPool, NewtonOptimizer
+
+from .utils import x, y, z, theta, approx_eq
+
+
+def test_pickle_actuator():
+    arm = Actuator(['z', 1., 'y', 1.], optimizer=NewtonOptimizer())
+    arm.angles = [theta, theta]
+    copied = pickle.loads(pickle.dumps(arm))
+    assert approx_eq(copied.angles, [theta, theta])
+    copied.ee = [x, -y, z]
+    assert approx_eq(copied.angles, [-theta, -theta])
+
+
+def test_ik_pool():
+    arm = Actuator(['z', 1., 'y', 1.])
+    targets = [[x, y, -z], [x, -y, z], [2., 0., 0.]] * 3
+    with IKPool(arm, processes=2, chunksize=2) as pool:
+        angles, converged = pool.solve(targets)
+    assert angles.shape == (9, 2)
+    assert all(converged)
+    for a, expected in zip(
+            angles, [[theta, theta], [-theta, -theta], [0., 0.]] * 3):
+        assert approx_eq(a, expected)
+    assert np.allclose(arm.angles, 0.)
+
+
+def test_ik_pool_fabrik():
+    arm = Actuator(['z', 1., 'y', 1.], solver='fabrik')
+    targets = [[x, y, -z], [x, -y, z]] * 2
+    with IKPool(arm, processes=2, chunksize=1) as pool:
+        angles, converged = pool.solve(targets, [[0., 0.]] * 4)
+    assert all(converged)
+    for a, expected in zip(angles, [[theta, theta], [-theta, -theta]] * 2):
+        assert approx_eq(a, expected)
+
+
+def test_ik_pool_seeds():
+    # Without iterations, every target keeps its own seed.
+    arm = Actuator(['z', 1., 'y', 1.], optimizer=NewtonOptimizer(maxiter=0))
+    seeds = np.array([[0., 0.], [.1, .1], [.2, .2], [.3, .3]])
+    with IKPool(arm, processes=2, chunksize=2) as pool:
+        angles, _ = pool.solve([[x, y, -z]] * 4, seeds, warm_start=False)
+        assert np.allclose(angles, seeds)
+        with pytest.raises(ValueError):
+            pool.solve([[x, y, -z]] * 3, seeds)
+    with pytest.raises(ValueError):
+        arm.ik.solve_many([[x, y, -z]] * 3, seeds)
@@ -1,4 +1,10 @@
-from tinyik import Link, Joint, FKSolver, CCDFKSolver, CCDIKSolver
+import numpy as np
+import pytest
+
+from tinyik import (
+    Link, Joint, PrismaticJoint, FKSolver, CCDFKSolver, CCDIKSolver,
+    FABRIKSolver
+)
 
 from .utils import x, y, z, theta, approx_eq
 
@@ -15,6 +21,15 @@ def test_fk():
     assert approx_eq(fk.solve([-theta, -theta]), [x, -y, z])
 
 
+def test_fk_batch():
+    fk = FKSolver(components)
+    angles = np.random.RandomState(0).uniform(-np.pi, np.pi, (10, 2))
+    positions = fk.solve_batch(angles)
+    assert positions.shape == (10, 3)
+    assert np.allclose(positions, [fk.solve(a) for a in angles])
+    assert approx_eq(fk.solve_batch([theta, theta])[0], [x, y, -z])
+
+
 def test_ccd_fk():
     fk = CCDFKSolver(components)
     assert all(fk.solve([0., 0.]) == predicted)
@@ -28,3 +43,196 @@ def test_ccd_ik():
     ik = CCDIKSolver(fk)
     assert approx_eq(ik.solve([0., 0.], [x, y, -z]), [theta, theta])
     assert approx_eq(ik.solve([0., 0.], [x, -y, z]), [-theta, -theta])
+
+
+def test_fabrik_ik():
+    ik = FABRIKSolver(FKSolver(components))
+    assert approx_eq(ik.solve([0., 0.], [x, y, -z]), [theta, theta])
+    assert ik.stats.status == 'tol' and ik.stats.residual <= 1e-6
+    assert approx_eq(ik.solve([0., 0.], [x, -y, z]), [-theta, -theta])
+    with pytest.raises(ValueError):
+        ik.solve([0., 0.], np.eye(4))
+
+
+def test_fabrik_solve_many():
+    ik = FABRIKSolver(FKSolver(components))
+    angles, converged = ik.solve_many([[x, y, -z], [x, -y, z], [3., 0., 0.]])
+    assert angles.shape == (3, 2)
+    assert list(converged) == [True, True, False]
+    assert approx_eq(angles[0], [theta, theta])
+    assert approx_eq(angles[1], [-theta, -theta])
+    with pytest.raises(ValueError):
+        ik.solve_many([[x, y, -z]], [[0., 0.], [0., 0.]])
+
+    # A failed solve does not warm start the next one.
+    angles, converged = ik.solve_many([[np.nan, 0., 0.], [x, y, -z]])
+    assert list(converged) == [False, True]
+    assert approx_eq(angles[1], [theta, theta])
+
+
+def test_fabrik_ik_long_chain():
+    chain = []
+    for i in range(30):
+        chain += [Joint('zyx'[i % 3]), Link([1. / 30, 0., 0.])]
+    fk = FKSolver(chain)
+    ik = FABRIKSolver(fk)
+    rs = np.random.RandomState(0)
+    for target in fk.solve_batch(rs.uniform(-np.pi, np.pi, (5, 30))):
+        angles = ik.solve(np.zeros(30), target)
+        assert np.linalg.norm(fk.solve(angles) - target) <= 1e-6
+
+
+def test_fabrik_ik_axes_and_limits():
+    fk = FKSolver([
+        PrismaticJoint('z', limits=(0., .5)), Joint('z'), Link([0., 0., .5]),
+        Joint([1., 1., 0.], limits=(-1., 1.)), Link([1., 0., 0.]),
+        Joint('y'), Link([0., 0., 1.])])
+    ik = FABRIKSolver(fk, maxiter=200)
+    target = fk.solve([.3, .4, .5, -.6])
+    angles = ik.solve([0., 0., 0., 0.], target)
+    assert np.linalg.norm(fk.solve(angles) - target) <= 1e-6
+    assert 0. <= angles[0] <= .5 and -1. <= angles[2] <= 1.
+
+
+def test_fk_jacobian():
+    import autograd
+
+    fk = FKSolver(components)
+    for angles in ([0., 0.], [theta, -theta], [1., 2.]):
+        angles = np.array(angles)
+        position, jacobian = fk.linearize(angles)
+        assert np.allclose(position, fk.solve(angles))
+        assert np.allclose(
+            jacobian, autograd.jacobian(fk.solve)(angles))
+
+
+def test_fk_consecutive_links():
+    fk = FKSolver([
+        Link([0., 0., 1.]), Link([.5, 0., 0.]), Joint('z'),
+        Link([.5, 0., 0.]), Link([.5, 0., 0.]), Joint('y'),
+        Link([1., 0., 0.])])
+    assert len(fk.chain.constants) == 3
+    assert approx_eq(fk.solve([0., 0.]), [2.5, 0., 1.])
+    assert approx_eq(fk.solve([np.pi / 2, np.pi / 2]), [.5, 1., 0.])
+    ccd_fk = CCDFKSolver(fk.components)
+    assert approx_eq(ccd_fk.solve([np.pi / 2, 0.], index=3), [.5, .5, 1.])
+
+
+def test_ccd_fk_cache():
+    fk = CCDFKSolver(components * 3)
+    rs = np.random.RandomState(0)
+    angles = rs.uniform(-np.pi, np.pi, 6)
+    fk.reset(angles)
+    for i in rs.randint(0, 6, 20):
+        angles[i] = rs.uniform(-np.pi, np.pi)
+        fk.update(i, angles[i])
+        assert np.allclose(fk.end_effector(), fk.solve(angles))
+        position, axis = fk.joint(i)
+        index = fk.joint_indexes[i]
+        assert np.allclose(position, fk.solve(angles, index=index))
+        assert np.allclose(
+            axis, fk.solve(angles, p=[0., 0., 1., 0.] if i % 2 == 0
+                           else [0., 1., 0., 0.], index=index))
+
+
+def test_fk_poses():
+    fk = FKSolver(components)
+    ccd_fk = CCDFKSolver(components)
+    angles = np.array([theta, -theta])
+    poses = fk.poses(angles, [1, 2, -1])
+    assert poses.shape == (3, 4, 4)
+    for pose, index in zip(poses, [1, 2, 3]):
+        assert np.allclose(pose[:3, 3], ccd_fk.solve(angles, index=index))
+        assert np.allclose(
+            pose[:3, 2], ccd_fk.solve(angles, p=[0., 0., 1., 0.],
+                                      index=index))
+
+    poses, jacobians = fk.linearize_poses(angles, [1, -1])
+    assert jacobians.shape == (2, 6, 2)
+    assert np.allclose(jacobians[1, :3], fk.jacobian(angles))
+    assert np.allclose(jacobians[0, :, 1], 0.)
+    assert np.allclose(jacobians[1, 3:], [[0., -np.sin(theta)],
+                                          [0., np.cos(theta)],
+                                          [1., 0.]])
+
+
+def test_ccd_ik_with_joint_limits():
+    fk = CCDFKSolver([
+        Joint('z'), Link([1., 0., 0.]),
+        Joint('z', limits=(-np.pi, -.1)), Link([1., 0., 0.])
+    ])
+    angles = CCDIKSolver(fk).solve([.3, -.2], [1., 1., 0.])
+    assert -np.pi <= angles[1] <= -.1
+    assert approx_eq(angles, [np.pi / 2, -np.pi / 2])
+
+
+def test_fk_arbitrary_axes():
+    tilted = [1., 1., 0.]
+    joint = Joint(tilted)
+    assert np.allclose(joint.vector, np.array(tilted) / np.sqrt(2))
+    assert np.allclose(Joint('y').matrix(theta), Joint([0., 2., 0.]).matrix(
+        theta))
+
+    fk = FKSolver([Joint('z'), Link([1., 0., 0.]), joint, Link([0., 0., 1.])])
+    assert approx_eq(fk.solve([0., np.pi]), [1., 0., -1.])
+    assert approx_eq(fk.solve([0., np.pi / 2]),
+                     [1. + np.sqrt(.5), -np.sqrt(.5), 0.])
+    with pytest.raises(ValueError):
+        Joint('w')
+    with pytest.raises(ValueError):
+        Joint([0., 0., 0.])
+
+
+def test_fk_prismatic():
+    import autograd
+
+    fk = FKSolver([
+        PrismaticJoint('z', limits=(0., 1.)), Joint('z'), Link([1., 0., 0.]),
+        Joint([0., 1., 1.]), PrismaticJoint('x'), Link([1., 0., 0.])])
+    angles = np.array([.3, theta, 1., .2])
+    assert approx_eq(fk.solve([.5, 0., 0., 1.]), [3., 0., .5])
+    assert np.allclose(fk.solve_batch(angles[None])[0], fk.solve(angles))
+    position, jacobian = fk.linearize(angles)
+    assert np.allclose(jacobian, autograd.jacobian(fk.solve)(angles))
+    assert np.allclose(jacobian[:, 0], [0., 0., 1.])
+    _, jacobians = fk.linearize_poses(angles, [-1])
+    assert np.allclose(jacobians[0, 3:, [0, 3]], 0.)
+
+
+def test_ccd_ik_prismatic():
+    fk = CCDFKSolver([
+        PrismaticJoint('z', limits=(0., 1.)), Joint('z'), Link([1., 0., 0.])])
+    angles = CCDIKSolver(fk).solve([0., 0.], [0., 1., .5])
+    assert approx_eq(angles, [.5, np.pi / 2])
+    assert approx_eq(fk.solve(CCDIKSolver(fk).solve([0., 0.], [1., 0., 2.])),
+                     [1., 0., 1.])
+
+
+def test_fk_backends():
+    chain = [
+        Joint('z'), Link([1., 0., 0.]), PrismaticJoint([0., 1., 1.]),
+        Joint('y'), Link([1., 0., 0.])]
+    numpy_fk = FKSolver(chain, backend='numpy')
+    autograd_fk = FKSolver(chain, backend='autograd')
+    rs = np.random.RandomState(0)
+    angles = rs.uniform(-np.pi, np.pi, (5, 3))
+    for a in angles:
+        assert np.allclose(numpy_fk.solve(a), autograd_fk.solve(a))
+        for p, q in zip(numpy_fk.linearize(a), autograd_fk.linearize(a)):
+            assert np.allclose(p, q)
+        for p, q in zip(numpy_fk.linearize_poses(a, [1, 3, 4]),
+                        autograd_fk.linearize_poses(a, [1, 3, 4])):
+            assert np.allclose(p, q)
+        assert np.allclose(numpy_fk.chain.pose(a, 3),
+                           autograd_fk.chain.pose(a, 3))
+    assert np.allclose(numpy_fk.solve_batch(angles),
+                       autograd_fk.solve_batch(angles))
+
+    out = np.empty(3)
+    assert numpy_fk.solve(angles[0], out) is out
+    assert np.allclose(out, autograd_fk.solve(angles[0]))
+    out = np.empty((5, 3))
+    assert numpy_fk.solve_batch(angles, out) is out
+    assert np.allclose(out, autograd_fk.solve_batch(angles))
+    with pytest.raises(ValueError):
+        FKSolver(chain, backend='jax')
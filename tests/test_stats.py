@@ -0,0 +1,48 @@
+from tinyik import (
+    Link, Joint, FKSolver, IKSolver, CCDFKSolver, CCDIKSolver,
+    NewtonOptimizer, SteepestDescentOptimizer, ConjugateGradientOptimizer,
+    DampedLeastSquaresOptimizer, ScipyOptimizer, ScipySmoothOptimizer
+)
+
+from .utils import x, y, z
+
+
+components = [Joint('z'), Link([1., 0., 0.]), Joint('y'), Link([1., 0., 0.])]
+
+
+def test_optimizer_stats():
+    for optimizer in [
+            NewtonOptimizer(),
+            SteepestDescentOptimizer(maxiter=100, alpha=0.1),
+            ConjugateGradientOptimizer(),
+            DampedLeastSquaresOptimizer(),
+            ScipyOptimizer(),
+            ScipySmoothOptimizer(smooth_factor=0.)]:
+        collected = []
+        optimizer.add_hook(collected.append)
+        ik = IKSolver(FKSolver(components), optimizer)
+        ik.solve([0., 0.], [x, y, -z])
+        stats = ik.stats
+        assert collected == [stats]
+        assert stats.success and stats.status == 'tol'
+        assert stats.iterations > 0
+        assert stats.nfev + stats.njev > 0
+        assert stats.residual < 1e-4
+        assert 0. < stats.times['fk'] <= stats.time
+
+        ik.solve([0., 0.], [x, y, -z], maxiter=1)
+        assert ik.stats.status == 'maxiter' and not ik.stats.success
+        assert len(collected) == 2
+        optimizer.remove_hook(collected.append)
+
+
+def test_ccd_stats():
+    ik = CCDIKSolver(CCDFKSolver(components))
+    collected = []
+    ik.add_hook(collected.append)
+    ik.solve([0., 0.], [x, y, -z])
+    assert collected == [ik.stats]
+    assert ik.stats.success
+    assert ik.stats.residual < 1e-6
+    ik.solve([0., 0.], [x, y, -z], deadline=0.)
+    assert ik.stats.status == 'deadline'
@@ -0,0 +1,128 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from tinyik import (
+    Actuator, Link, Joint, PrismaticJoint, IKSolver, SolutionCache,
+    Workspace, DampedLeastSquaresOptimizer, ScipyOptimizer,
+    ScipySmoothOptimizer,
+    ConvergencePolicy, FABRIKSolver
+)
+
+from .utils import x, y, z, theta, approx_eq
+
+
+def test_save_and_load(tmp_path):
+    arm = Actuator(['z', 1., Joint([0., 1., 1.], limits=(-1., None)),
+                    [1., 0., 0.]],
+                   optimizer=DampedLeastSquaresOptimizer(
+                       damping=.1,
+                       policy=ConvergencePolicy(residual_tol=1e-4)))
+    arm.angles = [.3, -.2]
+    path = str(tmp_path / 'arm')
+    arm.save(path)
+    loaded = Actuator.load(path)
+    assert np.all(loaded.angles == arm.angles)
+    assert np.allclose(loaded.ee, arm.ee)
+    assert np.all(loaded.limits[0] == arm.limits[0])
+    assert isinstance(loaded.ik.optimizer, DampedLeastSquaresOptimizer)
+    assert loaded.ik.optimizer.damping == .1
+    assert loaded.ik.optimizer.policy.residual_tol == 1e-4
+
+    with open(os.path.join(path, 'actuator.json')) as f:
+        description = json.load(f)
+    description['version'] = 0
+    with open(os.path.join(path, 'actuator.json'), 'w') as f:
+        json.dump(description, f)
+    with pytest.raises(ValueError):
+        Actuator.load(path)
+
+
+def test_save_and_load_fabrik(tmp_path):
+    arm = Actuator(['z', 1., 'y', 1.], solver='fabrik')
+    arm.ik.maxiter = 20
+    path = str(tmp_path / 'arm')
+    arm.save(path)
+    loaded = Actuator.load(path)
+    assert isinstance(loaded.ik, FABRIKSolver)
+    assert loaded.ik.maxiter == 20
+    loaded.ee = [x, y, -z]
+    assert approx_eq(loaded.angles, [theta, theta])
+
+
+def test_save_and_load_solver_state(tmp_path):
+    components = [
+        PrismaticJoint('z', limits=(0., 1.)), Joint('z'), Link([1., 0., 0.]),
+        Joint('y'), Link([1., 0., 0.])]
+    arm = Actuator(components, dtype=np.float32)
+    optimizer = ScipySmoothOptimizer(
+        smooth_factor=[0., .1, .1], method='L-BFGS-B',
+        options={'maxiter': 20})
+    arm.ik = IKSolver(
+        arm.fk, optimizer, cache=SolutionCache(),
+        workspace=Workspace.sample(arm.fk, .25, samples=2000,
+                                   random_state=0))
+    arm.ik.cache.put(b'a\x00', [1., 1., 0.], [0., np.pi / 4, 0.])
+    arm.ik.cache.put(b'b', [x, y, -z], [0., theta, theta])
+    path = str(tmp_path / 'arm')
+    arm.save(path)
+
+    loaded = Actuator.load(path)
+    assert loaded.angles.dtype == np.float32
+    assert loaded.ik.optimizer.smooth_factor == [0., .1, .1]
+    assert loaded.ik.optimizer.optimizer_opt == optimizer.optimizer_opt
+    workspace = loaded.ik.workspace
+    assert not workspace.seeds.flags.writeable  # a read-only memory map
+    assert len(workspace) == len(arm.ik.workspace)
+    assert np.all(workspace.seeds == arm.ik.workspace.seeds)
+    cache = loaded.ik.cache
+    assert len(cache) == 2
+    assert approx_eq(cache.get(b'b'), [0., theta, theta])
+    assert approx_eq(cache.nearest([1., 1., 0.]), [0., np.pi / 4, 0.])
+
+    in_memory = Actuator.load(path, mmap_mode=None)
+    assert in_memory.ik.workspace.seeds.flags.writeable
+
+
+def test_save_to_loaded_directory(tmp_path):
+    arm = Actuator(['z', 1., 'y', 1.])
+    arm.ik = IKSolver(arm.fk, arm.ik.optimizer, cache=SolutionCache(),
+                      workspace=Workspace.sample(arm.fk, .25, samples=500,
+                                                 random_state=0))
+    arm.ik.cache.put(b'b', [x, y, -z], [theta, theta])
+    path = str(tmp_path / 'arm')
+    arm.save(path)
+
+    loaded = Actuator.load(path)
+    loaded.ik.cache.put(b'a', [1., 1., 0.], [0., np.pi / 2])
+    loaded.save(path)
+    assert sorted(os.listdir(path)) == sorted(
+        ['actuator.json', 'angles.npy', 'workspace_voxels.npy',
+         'workspace_seeds.npy', 'cache_keys.npy', 'cache_key_lengths.npy',
+         'cache_positions.npy', 'cache_angles.npy'])
+    reloaded = Actuator.load(path)
+    assert len(reloaded.ik.workspace) == len(arm.ik.workspace)
+    assert approx_eq(reloaded.ik.cache.get(b'b'), [theta, theta])
+    assert approx_eq(reloaded.ik.cache.get(b'a'), [0., np.pi / 2])
+
+
+def test_save_whole_directory(tmp_path):
+    arm = Actuator(['z', 1., 'y', 1.])
+    arm.angles = [theta, theta]
+    path = str(tmp_path / 'arm')
+    arm.save(path)
+    umask = os.umask(0)
+    os.umask(umask)
+    for name in os.listdir(path) + ['']:
+        mode = os.stat(os.path.join(path, name)).st_mode & 0o777
+        assert mode == (0o777 if name == '' else 0o666) & ~umask
+
+    # Nothing is written if the description cannot be saved.
+    arm.ik.optimizer = ScipyOptimizer(callback=print)
+    arm.angles = [0., 0.]
+    with pytest.raises(TypeError):
+        arm.save(path)
+    assert os.listdir(str(tmp_path)) == ['arm']
+    assert approx_eq(Actuator.load(path).angles, [theta, theta])
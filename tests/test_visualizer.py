@@ -1,8 +1,46 @@
 import numpy as np
+import pytest
 
 import tinyik
+from tinyik import Actuator, Joint
+from tinyik.visualizer import align, component_poses
 
 
+def test_align():
+    for direction in ([1., 2., 3.], [0., 0., 1.], [0., 0., -2.],
+                      [0., -1., 0.]):
+        unit = np.array(direction) / np.linalg.norm(direction)
+        m = align(direction)
+        assert np.allclose(m[:3, 2], unit)
+        assert np.allclose(np.dot(m[:3, :3].T, m[:3, :3]), np.eye(3))
+
+
+def test_component_poses():
+    arm = Actuator(['z', [1., 0., 0.], Joint([0., 1., 1.]), [0., 0., 1.]])
+    trajectory = np.random.RandomState(0).uniform(-np.pi, np.pi, (4, 2))
+    poses = component_poses(arm, trajectory)
+    assert poses.shape == (4, 5, 4, 4)
+    assert np.allclose(poses[:, 0], np.eye(4))
+    for angles, frames in zip(trajectory, poses):
+        for i in range(4):
+            assert np.allclose(frames[i + 1], arm.fk.chain.pose(angles, i))
+        assert np.allclose(frames[-1][:3, 3], arm.fk.solve(angles))
+
+
+def test_export_frames(tmp_path):
+    pytest.importorskip('open3d')
+    from tinyik import export_frames
+
+    arm = Actuator(['z', [1., 0., 0.], 'y', [1., 0., 0.]])
+    trajectory = np.linspace([0., 0.], [np.pi / 2, np.pi / 2], 3)
+    paths = export_frames(arm, trajectory, str(tmp_path / '{:02d}.ply'),
+                          targets=[[1., 1., 0.]] * 3)
+    assert len(paths) == 3
+    assert all((tmp_path / '{:02d}.ply'.format(i)).exists() for i in range(3))
+
+
+# Manual checks of the visualization, run as a script with open3d.
+
 tokens = [
     [.3, .0, .0], 'z', [.3, .0, .0], 'x', [.0, -.5, .0], 'x', [.0, -.5, .0]]
 
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from tinyik import (
+    Link, Joint, FKSolver, IKSolver, ScipyOptimizer, Workspace
+)
+
+from .utils import x, y, z, theta, approx_eq
+
+
+fk = FKSolver([Joint('z'), Link([1., 0., 0.]), Joint('y'), Link([1., 0., 0.])])
+
+
+def test_workspace(tmpdir):
+    workspace = Workspace.sample(fk, .25, samples=20000, random_state=0)
+    assert workspace.reachable([x, y, -z])
+    assert not workspace.reachable([3., 0., 0.])
+    seed = workspace.seed([x, y, -z])
+    assert np.linalg.norm(fk.solve(seed) - [x, y, -z]) < .25 * np.sqrt(3)
+
+    path = str(tmpdir.join('workspace.npz'))
+    workspace.save(path)
+    loaded = Workspace.load(path)
+    assert loaded.voxel_size == workspace.voxel_size
+    assert len(loaded) == len(workspace)
+    assert np.all(loaded.seed([x, y, -z]) == seed)
+
+
+def test_inverse_kinematics_with_workspace():
+    workspace = Workspace.sample(fk, .25, samples=20000, random_state=0)
+    ik = IKSolver(fk, ScipyOptimizer(), workspace=workspace)
+    assert approx_eq(ik.solve([0., 0.], [x, y, -z]), [theta, theta])
+    with pytest.raises(ValueError):
+        ik.solve([0., 0.], [3., 0., 0.])
+    angles, converged = ik.solve_many([[x, -y, z], [3., 0., 0.]])
+    assert list(converged) == [True, False]
+    assert approx_eq(angles[0], [-theta, -theta])
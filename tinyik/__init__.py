@@ -1,21 +1,34 @@
 """A simple and naive inverse kinematics solver."""
 
 from .core import Actuator
-from .component import Link, Joint
-from .solver import FKSolver, IKSolver, CCDFKSolver, CCDIKSolver
+from .cache import SolutionCache
+from .workspace import Workspace
+from .component import Link, Joint, PrismaticJoint
+from .solver import (
+    FKSolver, IKSolver, CCDFKSolver, CCDIKSolver, FABRIKSolver
+)
 from .optimizer import (
     NewtonOptimizer, SteepestDescentOptimizer, ConjugateGradientOptimizer,
-    ScipyOptimizer, ScipySmoothOptimizer
+    DampedLeastSquaresOptimizer, NullSpaceOptimizer, ScipyOptimizer,
+    ScipySmoothOptimizer
 )
-from .visualizer import visualize
+from .convergence import ConvergencePolicy
+from .stats import SolveStats
+from .pool import IKPool
+from .aio import AsyncIKSolver
+from .visualizer import visualize, animate, export_frames
 
 
 __all__ = (
     'Actuator',
-    'Link', 'Joint',
-    'FKSolver', 'IKSolver', 'CCDFKSolver', 'CCDIKSolver',
+    'SolutionCache', 'Workspace',
+    'Link', 'Joint', 'PrismaticJoint',
+    'FKSolver', 'IKSolver', 'CCDFKSolver', 'CCDIKSolver', 'FABRIKSolver',
     'NewtonOptimizer', 'SteepestDescentOptimizer',
-    'ConjugateGradientOptimizer',
+    'ConjugateGradientOptimizer', 'DampedLeastSquaresOptimizer',
+    'NullSpaceOptimizer',
     'ScipyOptimizer', 'ScipySmoothOptimizer',
-    'visualize'
+    'ConvergencePolicy', 'SolveStats',
+    'IKPool', 'AsyncIKSolver',
+    'visualize', 'animate', 'export_frames'
 )
@@ -0,0 +1,63 @@
+"""An asyncio front end for IK solvers."""
+
+
+class AsyncIKSolver(object):
+    """Gathers concurrent IK requests into batched solves.
+
+    Requests arriving within window seconds of the first pending one are
+    solved together by solve_many of the IK solver, an IKSolver or a
+    FABRIKSolver, in an executor, so the event loop never blocks. Only one
+    batch runs at a time; requests arriving meanwhile form the next batch.
+    Like IKSolver.solve, a request for a target out of the workspace raises
+    ValueError.
+    """
+
+    def __init__(self, ik_solver, window=.001, executor=None):
+        """Wrap an IK solver instance."""
+        self.ik_solver = ik_solver
+        self.window = window
+        self.executor = executor
+        self._pending = []
+        self._timer = None
+        self._running = False
+
+    async def solve(self, target, angles0):
+        """Calculate joint angles and returns it."""
+        import asyncio  # already loaded by the running event loop
+        reachable = getattr(self.ik_solver, 'reachable', None)
+        if reachable is not None and not reachable(target):
+            raise ValueError(
+                'the target is out of the workspace: {}'.format(target))
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._pending.append((target, angles0, future))
+        if self._timer is None and not self._running:
+            self._timer = loop.call_later(self.window, self._flush, loop)
+        return await future
+
+    def _flush(self, loop):
+        self._timer = None
+        batch = [p for p in self._pending if not p[2].done()]
+        self._pending = []
+        if not batch:
+            return
+        self._running = True
+        targets, angles0, futures = zip(*batch)
+        task = loop.run_in_executor(
+            self.executor, self.ik_solver.solve_many,
+            list(targets), list(angles0))
+        task.add_done_callback(
+            lambda t: self._resolve(loop, futures, t))
+
+    def _resolve(self, loop, futures, task):
+        self._running = False
+        if task.exception() is not None:
+            for f in futures:
+                if not f.done():
+                    f.set_exception(task.exception())
+        else:
+            for f, angles in zip(futures, task.result()[0]):
+                if not f.done():
+                    f.set_result(angles)
+        if self._pending:
+            self._flush(loop)
@@ -0,0 +1,35 @@
+"""Array modules for evaluating kinematics."""
+
+import sys
+
+import numpy
+
+
+backends = ('auto', 'numpy', 'autograd')
+
+
+def array_module(*values):
+    """Return the module to evaluate functions of values with.
+
+    It is autograd.numpy if any of the values is being traced by autograd,
+    and numpy otherwise. Nothing can be traced unless autograd has been
+    imported, so this never imports autograd.
+    """
+    if 'autograd' in sys.modules:
+        from autograd.tracer import Box
+        if any(isinstance(v, Box) for v in values):
+            import autograd.numpy
+            return autograd.numpy
+    return numpy
+
+
+def in_place(backend, *values):
+    """Tell whether functions of values can be evaluated in place.
+
+    The 'numpy' backend always evaluates them with plain NumPy into scratch
+    buffers, 'autograd' always with functions autograd can trace, and 'auto'
+    in place unless any of the values is being traced.
+    """
+    if backend == 'auto':
+        return array_module(*values) is numpy
+    return backend == 'numpy'
@@ -0,0 +1,93 @@
+"""Caches of IK solutions."""
+
+from collections import OrderedDict
+import itertools
+
+import numpy as np
+
+
+class SolutionCache(object):
+    """A bounded LRU cache of IK solutions with a spatial index.
+
+    Solutions are stored by the exact target. Their positions are also put
+    into a grid of cells as large as radius, so the solution of the nearest
+    cached position within radius can be found by looking at 27 cells.
+    """
+
+    def __init__(self, maxsize=256, radius=.1):
+        """Create an empty cache."""
+        self.maxsize = maxsize
+        self.radius = radius
+        self.clear()
+
+    def __len__(self):
+        """Return the number of cached solutions."""
+        return len(self._entries)
+
+    def clear(self):
+        """Remove all solutions and reset the counters."""
+        self._entries = OrderedDict()
+        self._cells = {}
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the solution of an exact target, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1].copy()
+
+    def nearest(self, position):
+        """Return the solution of the nearest cached position, or None.
+
+        It is counted in near_hits by the solver only if it is used.
+        """
+        position = np.asarray(position, dtype=float)
+        best, best_distance = None, self.radius
+        cell = self._cell(position)
+        for offset in itertools.product((-1, 0, 1), repeat=3):
+            neighbor = tuple(c + o for c, o in zip(cell, offset))
+            for key in self._cells.get(neighbor, ()):
+                p, angles = self._entries[key]
+                distance = np.linalg.norm(p - position)
+                if distance <= best_distance:
+                    best, best_distance = angles, distance
+        if best is None:
+            self.misses += 1
+            return None
+        return best.copy()
+
+    def put(self, key, position, angles, copy=True):
+        """Store a solution, evicting the least recently used if full.
+
+        Unless copy is true, float arrays are stored as they are, which is
+        for read-only arrays such as memory maps.
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        convert = np.array if copy else np.asarray
+        position = convert(position, dtype=float)
+        self._entries[key] = (position, convert(angles, dtype=float))
+        self._cells.setdefault(self._cell(position), set()).add(key)
+        while len(self._entries) > self.maxsize:
+            old, (p, _) = self._entries.popitem(last=False)
+            cell = self._cell(p)
+            self._cells[cell].discard(old)
+            if not self._cells[cell]:
+                del self._cells[cell]
+
+    def entries(self):
+        """Return the keys, positions and angles, least recently used first."""
+        keys = list(self._entries)
+        positions = np.reshape(
+            [p for p, _ in self._entries.values()], (len(keys), 3))
+        angles = np.array([a for _, a in self._entries.values()])
+        return keys, positions, angles
+
+    def _cell(self, position):
+        return tuple(int(c) for c in np.floor(position / self.radius))
@@ -0,0 +1,351 @@
+"""Compiled kinematic chains."""
+
+import threading
+
+import numpy as np
+
+from .backend import array_module, backends, in_place
+from .component import Joint, transform
+
+
+def _pack(arrays, shapes, dtype):
+    # Copy arrays into views of a single contiguous buffer.
+    sizes = [int(np.prod(shape)) for shape in shapes]
+    buffer = np.empty(sum(sizes), dtype=dtype)
+    views = []
+    start = 0
+    for array, shape, size in zip(arrays, shapes, sizes):
+        view = np.reshape(buffer[start:start + size], shape)
+        view[...] = np.reshape(array, shape)
+        views.append(view)
+        start += size
+    return buffer, views
+
+
+class _Scratch(object):
+    # Buffers reused by the in-place evaluations of a chain in a thread.
+
+    def __init__(self, n, dtype):
+        self.coefficients = np.zeros((n, 1, 3), dtype)
+        self.transforms = np.empty((n, 4, 4), dtype)
+        self.prefixes = np.empty((n + 1, 4, 4), dtype)
+        self.frames = np.empty((n, 4, 4), dtype)
+        self.axes = np.empty((n, 3), dtype)
+        self.m = np.empty((4, 4), dtype)
+        self.p = np.empty(4, dtype)
+        self.q = np.empty(4, dtype)
+        self.batch = None
+
+    def batch_buffers(self, size):
+        n, dtype = len(self.transforms), self.transforms.dtype
+        if self.batch is None or len(self.batch[0]) != size:
+            self.batch = (np.zeros((size, n, 1, 3), dtype),
+                          np.empty((size, n, 4, 4), dtype),
+                          np.empty((size, 4, 1), dtype),
+                          np.empty((size, 4, 1), dtype))
+        return self.batch
+
+
+class Chain(object):
+    """A kinematic chain compiled from link and joint instances.
+
+    Consecutive links are multiplied together in advance, so the chain is
+    evaluated as J + 1 constant matrices interleaved with J joint transforms,
+    which all come from one evaluation of the generators of the joints.
+
+    All parameters are views of one contiguous buffer of the given dtype, so
+    float32 halves the memory of a chain and keeps its results in float32.
+
+    The backend is 'auto', 'numpy' or 'autograd'. Angles not traced by
+    autograd are evaluated with plain NumPy into scratch buffers of the
+    calling thread, unless the backend is 'autograd', and traced angles with
+    autograd.numpy, unless it is 'numpy'.
+    """
+
+    def __init__(self, components, dtype=float, backend='auto'):
+        """Compile a chain from link and joint instances."""
+        if backend not in backends:
+            raise ValueError('unknown backend: {}'.format(backend))
+        joints = []
+        limits = []
+        constants = [np.eye(4)]
+        frame_joints = []
+        frame_offsets = []
+        offset = np.eye(4)
+        for c in components:
+            if isinstance(c, Joint):
+                joints.append(c)
+                lo, hi = (None, None) if c.limits is None else c.limits
+                limits.append((-np.inf if lo is None else lo,
+                               np.inf if hi is None else hi))
+                constants.append(np.eye(4))
+                offset = np.eye(4)
+            else:
+                m = c.matrix(None)
+                constants[-1] = np.dot(constants[-1], m)
+                offset = np.dot(offset, m)
+            frame_joints.append(len(joints))
+            frame_offsets.append(offset)
+
+        n = len(joints)
+        self.prismatic = np.array([j.prismatic for j in joints], dtype=bool)
+        self.frame_joints = np.array(frame_joints, dtype=int)
+        self.buffer, (self.constants, self.generators, self.frame_offsets,
+                      self.axes, limits) = _pack(
+            [constants, [j.generators for j in joints], frame_offsets,
+             [j.vector for j in joints], np.reshape(limits, (-1, 2)).T],
+            [(n + 1, 4, 4), (n, 3, 4, 4), (len(frame_offsets), 4, 4), (n, 3),
+             (2, n)], dtype)
+        self.lower, self.upper = limits
+        self.backend = backend
+        self._flat_generators = np.reshape(self.generators, (n, 3, 16))
+        self._local = threading.local()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @property
+    def dtype(self):
+        """The data type of the parameters."""
+        return self.buffer.dtype
+
+    def __len__(self):
+        """Return the number of joints."""
+        return len(self.axes)
+
+    def ranges(self):
+        """Return the ranges of the joints to sample angles from.
+
+        They are the limits where finite, and a span of 2 pi otherwise.
+        """
+        lower = np.where(np.isfinite(self.lower), self.lower,
+                         np.where(np.isfinite(self.upper),
+                                  self.upper - 2. * np.pi, -np.pi))
+        upper = np.where(np.isfinite(self.upper), self.upper,
+                         lower + 2. * np.pi)
+        return lower, upper
+
+    def transforms(self, angles):
+        """Return transforms of the joints for (rows of) angles."""
+        return transform(self.generators, angles)
+
+    def transform(self, index, angle):
+        """Return a transform of a single joint."""
+        return transform(self.generators[index], angle)
+
+    def solve(self, angles, out=None):
+        """Calculate a position of the end-effector and return it.
+
+        On the in-place path, it is written to out if given.
+        """
+        if in_place(self.backend, angles):
+            return self._solve_in_place(angles, out)
+        xp = array_module(angles)
+        transforms = self.transforms(angles)
+        p = self.constants[-1][:, 3]
+        for i in reversed(range(len(self))):
+            p = xp.dot(self.constants[i], xp.dot(transforms[i], p))
+        return p[:3]
+
+    def solve_batch(self, angles, out=None):
+        """Calculate positions of the end-effector for rows of angles.
+
+        On the in-place path, they are written to out if given.
+        """
+        if in_place(self.backend, angles):
+            return self._solve_batch_in_place(angles, out)
+        xp = array_module(angles)
+        transforms = self.transforms(angles)
+        p = self.constants[-1][:, 3, None]
+        for i in reversed(range(len(self))):
+            p = xp.matmul(self.constants[i], xp.matmul(transforms[:, i], p))
+        return p[:, :3, 0]
+
+    def prefixes(self, angles, n=None):
+        """Return the transforms from the base to each joint transform.
+
+        The i-th matrix is the frame of the chain just after the first i
+        joints, so the last one multiplied by the last constant matrix is the
+        end-effector frame. If n is given, only the first n + 1 are returned.
+        """
+        if in_place(self.backend, angles):
+            return list(self._prefixes_in_place(angles, n).copy())
+        xp = array_module(angles)
+        transforms = self.transforms(angles)
+        m = np.eye(4)
+        prefixes = [m]
+        for i in range(len(self) if n is None else n):
+            m = xp.dot(xp.dot(m, self.constants[i]), transforms[i])
+            prefixes.append(m)
+        return prefixes
+
+    def pose(self, angles, index):
+        """Return the transform from the base to a component."""
+        n = self.frame_joints[index]
+        if in_place(self.backend, angles):
+            prefix = self._prefixes_in_place(angles, n)[n]
+            return np.dot(prefix, self.frame_offsets[index])
+        xp = array_module(angles)
+        return xp.dot(self.prefixes(angles, n)[-1], self.frame_offsets[index])
+
+    def axis(self, index):
+        """Return the local axis vector of a joint."""
+        return self.axes[index]
+
+    def poses(self, angles, indexes):
+        """Return the transforms from the base to components."""
+        if in_place(self.backend, angles):
+            prefixes = self._prefixes_in_place(angles)
+            return np.matmul(prefixes[self.frame_joints[indexes]],
+                             self.frame_offsets[indexes])
+        xp = array_module(angles)
+        prefixes = xp.array(self.prefixes(angles))
+        return xp.matmul(prefixes[self.frame_joints[indexes]],
+                         self.frame_offsets[indexes])
+
+    def poses_batch(self, angles, indexes):
+        """Return the transforms to components for rows of angles."""
+        transforms = self.transforms(angles)
+        prefixes = np.empty((len(angles), len(self) + 1, 4, 4))
+        prefixes[:, 0] = np.eye(4)
+        for i in range(len(self)):
+            np.matmul(np.matmul(prefixes[:, i], self.constants[i]),
+                      transforms[:, i], out=prefixes[:, i + 1])
+        return np.matmul(prefixes[:, self.frame_joints[indexes]],
+                         self.frame_offsets[indexes])
+
+    def _joints(self, xp, prefixes):
+        frames = xp.matmul(xp.array(prefixes[:-1]), self.constants[:-1])
+        axes = xp.einsum('nij,nj->ni', frames[:, :3, :3], self.axes)
+        return frames[:, :3, 3], axes
+
+    def _linear(self, xp, axes, arms):
+        # A revolute joint moves a point by its axis crossed with the arm from
+        # the joint, and a prismatic joint moves it along its axis.
+        return xp.where(self.prismatic[:, None], axes, xp.cross(axes, arms))
+
+    def linearize(self, angles):
+        """Calculate the end-effector position and its Jacobian.
+
+        Each column of the Jacobian is the cross product of a joint axis and
+        the vector from the joint to the end-effector (or the axis itself for
+        a prismatic joint), so both come from one forward pass over the
+        chain.
+        """
+        if in_place(self.backend, angles):
+            xp = np
+            prefixes = self._prefixes_in_place(angles)
+        else:
+            xp = array_module(angles)
+            prefixes = self.prefixes(angles)
+        position = xp.dot(prefixes[-1], self.constants[-1][:, 3])[:3]
+        if not len(self):
+            return position, np.zeros((3, 0))
+        if xp is np:
+            origins, axes = self._joints_in_place(prefixes)
+        else:
+            origins, axes = self._joints(xp, prefixes)
+        return position, self._linear(xp, axes, position - origins).T
+
+    def linearize_poses(self, angles, indexes):
+        """Calculate transforms to components and their Jacobians.
+
+        The first three rows of each Jacobian are for the linear velocity of
+        the component and the last three are for its angular velocity. Joints
+        after a component do not move it, so their columns are zero.
+        """
+        if in_place(self.backend, angles):
+            xp = np
+            prefixes = self._prefixes_in_place(angles)
+        else:
+            xp = array_module(angles)
+            prefixes = self.prefixes(angles)
+        n = self.frame_joints[indexes]
+        poses = xp.matmul(xp.array(prefixes)[n], self.frame_offsets[indexes])
+        if not len(self):
+            return poses, np.zeros((len(poses), 6, 0))
+        if xp is np:
+            origins, axes = self._joints_in_place(prefixes)
+        else:
+            origins, axes = self._joints(xp, prefixes)
+        linear = self._linear(xp, axes, poses[:, None, :3, 3] - origins[None])
+        angular = xp.broadcast_to(
+            xp.where(self.prismatic[:, None], 0., axes), linear.shape)
+        mask = np.arange(len(self))[None, :, None] < n[:, None, None]
+        return poses, xp.swapaxes(
+            xp.concatenate([linear, angular], axis=2) * mask, 1, 2)
+
+    # The in-place path below writes every intermediate result to scratch
+    # buffers, and only the returned values are newly allocated.
+
+    def _scratch(self):
+        scratch = getattr(self._local, 'scratch', None)
+        if scratch is None:
+            scratch = self._local.scratch = _Scratch(len(self), self.dtype)
+        return scratch
+
+    def _transforms_in_place(self, angles, coefficients, transforms):
+        # The coefficients of the generators are multiplied by all of them at
+        # once, viewing each transform as a row of 16 values.
+        k = coefficients[..., 0, :]
+        np.sin(angles, out=k[..., 0])
+        np.cos(angles, out=k[..., 1])
+        np.subtract(1., k[..., 1], out=k[..., 1])
+        k[..., 2] = angles
+        flat = np.reshape(transforms, transforms.shape[:-2] + (1, 16))
+        np.matmul(coefficients, self._flat_generators, out=flat)
+        flat[..., 0, ::5] += 1.
+        return transforms
+
+    def _solve_in_place(self, angles, out):
+        scratch = self._scratch()
+        transforms = self._transforms_in_place(
+            angles, scratch.coefficients, scratch.transforms)
+        p, q = scratch.p, scratch.q
+        p[...] = self.constants[-1][:, 3]
+        for i in reversed(range(len(self))):
+            np.dot(transforms[i], p, out=q)
+            np.dot(self.constants[i], q, out=p)
+        if out is None:
+            return p[:3].copy()
+        out[...] = p[:3]
+        return out
+
+    def _solve_batch_in_place(self, angles, out):
+        coefficients, transforms, p, q = self._scratch().batch_buffers(
+            len(angles))
+        transforms = self._transforms_in_place(
+            angles, coefficients, transforms)
+        p[...] = self.constants[-1][:, 3, None]
+        for i in reversed(range(len(self))):
+            np.matmul(transforms[:, i], p, out=q)
+            np.matmul(self.constants[i], q, out=p)
+        if out is None:
+            return p[:, :3, 0].copy()
+        out[...] = p[:, :3, 0]
+        return out
+
+    def _prefixes_in_place(self, angles, n=None):
+        scratch = self._scratch()
+        transforms = self._transforms_in_place(
+            angles, scratch.coefficients, scratch.transforms)
+        prefixes, m = scratch.prefixes, scratch.m
+        prefixes[0] = np.eye(4)
+        for i in range(len(self) if n is None else n):
+            np.dot(prefixes[i], self.constants[i], out=m)
+            np.dot(m, transforms[i], out=prefixes[i + 1])
+        return prefixes if n is None else prefixes[:n + 1]
+
+    def _joints_in_place(self, prefixes):
+        scratch = self._scratch()
+        frames = np.matmul(prefixes[:-1], self.constants[:-1],
+                           out=scratch.frames)
+        axes = np.einsum('nij,nj->ni', frames[:, :3, :3], self.axes,
+                         out=scratch.axes)
+        return frames[:, :3, 3], axes
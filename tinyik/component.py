@@ -1,62 +1,119 @@
 """Components for an actuator."""
 
-import autograd.numpy as np
+import numpy as np
+
+from .backend import array_module
+
+
+_unit_axes = {'x': [1., 0., 0.], 'y': [0., 1., 0.], 'z': [0., 0., 1.]}
+
+
+def generators(axis, prismatic=False):
+    """Return the matrices generating the transforms of a joint.
+
+    A joint moved by t is I + sin(t) A + (1 - cos(t)) B + t C, where for a
+    revolute joint A is the cross product matrix K of the unit axis and B is
+    K^2 (Rodrigues' formula), and for a prismatic joint C translates along
+    the axis. They are stacked as an array of shape (3, 4, 4).
+    """
+    x, y, z = axis
+    g = np.zeros((3, 4, 4))
+    if prismatic:
+        g[2, :3, 3] = axis
+    else:
+        g[0, :3, :3] = [[0., -z, y], [z, 0., -x], [-y, x, 0.]]
+        g[1] = np.dot(g[0], g[0])
+    return g
+
+
+def transform(generators, angles):
+    """Return the transforms of joints moved by angles.
+
+    The generators of shape (..., 3, 4, 4) broadcast against the angles, so
+    a whole chain or batches of angles go through a single evaluation.
+    """
+    xp = array_module(angles)
+    t = xp.reshape(angles, xp.shape(angles) + (1, 1))
+    return (np.eye(4, dtype=generators.dtype) +
+            xp.sin(t) * generators[..., 0, :, :] +
+            (1. - xp.cos(t)) * generators[..., 1, :, :] +
+            t * generators[..., 2, :, :])
 
 
 class Link(object):
     """Represents a link."""
 
+    __slots__ = ('_coord', '_matrix')
+
     def __init__(self, coord):
         """Create a link from a specified coordinate."""
         self.coord = coord
 
-    def matrix(self, _):
-        """Return translation matrix in homogeneous coordinates."""
-        x, y, z = self.coord
-        return np.array([
+    @property
+    def coord(self):
+        """The coordinate of the end of the link."""
+        return self._coord
+
+    @coord.setter
+    def coord(self, coord):
+        x, y, z = coord
+        self._coord = coord
+        self._matrix = np.array([
             [1., 0., 0., x],
             [0., 1., 0., y],
             [0., 0., 1., z],
             [0., 0., 0., 1.]
         ])
+        self._matrix.flags.writeable = False
+
+    def matrix(self, _):
+        """Return translation matrix in homogeneous coordinates.
+
+        It is built once per coordinate and shared, so it is read-only.
+        """
+        return self._matrix
 
 
 class Joint(object):
     """Represents a revolute joint."""
 
-    def __init__(self, axis):
-        """Create a revolute joint from a specified axis."""
+    __slots__ = ('axis', 'vector', 'limits', 'generators')
+
+    prismatic = False
+
+    def __init__(self, axis, limits=None):
+        """Create a joint from a specified axis.
+
+        The axis is 'x', 'y', 'z' or any nonzero vector, which is normalized.
+        The limits are an optional pair of lower and upper angles, either of
+        which may be None for no limit.
+        """
+        if isinstance(axis, str):
+            vector = np.array(_unit_axes.get(axis, [0., 0., 0.]))
+        else:
+            vector = np.array(axis, dtype=float)
+        norm = np.linalg.norm(vector) if vector.shape == (3,) else 0.
+        if not norm:
+            raise ValueError(
+                'the axis needs to be x, y, z or a nonzero vector: {}'.format(
+                    axis))
         self.axis = axis
+        self.vector = vector / norm
+        self.limits = limits
+        self.generators = generators(self.vector, self.prismatic)
 
     def matrix(self, angle):
-        """Return rotation matrix in homogeneous coordinates."""
-        _rot_mat = {
-            'x': self._x_rot,
-            'y': self._y_rot,
-            'z': self._z_rot
-        }
-        return _rot_mat[self.axis](angle)
-
-    def _x_rot(self, angle):
-        return np.array([
-            [1., 0., 0., 0.],
-            [0., np.cos(angle), -np.sin(angle), 0.],
-            [0., np.sin(angle), np.cos(angle), 0.],
-            [0., 0., 0., 1.]
-        ])
+        """Return transformation matrix in homogeneous coordinates."""
+        return transform(self.generators, angle)
 
-    def _y_rot(self, angle):
-        return np.array([
-            [np.cos(angle), 0., np.sin(angle), 0.],
-            [0., 1., 0., 0.],
-            [-np.sin(angle), 0., np.cos(angle), 0.],
-            [0., 0., 0., 1.]
-        ])
 
-    def _z_rot(self, angle):
-        return np.array([
-            [np.cos(angle), -np.sin(angle), 0., 0.],
-            [np.sin(angle), np.cos(angle), 0., 0.],
-            [0., 0., 1., 0.],
-            [0., 0., 0., 1.]
-        ])
+class PrismaticJoint(Joint):
+    """Represents a prismatic joint sliding along its axis.
+
+    Its angle is the displacement along the axis, and its limits are the
+    lower and upper displacements.
+    """
+
+    __slots__ = ()
+
+    prismatic = True
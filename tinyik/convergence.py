@@ -0,0 +1,93 @@
+"""Convergence criteria shared by solvers."""
+
+import time
+
+
+class ConvergencePolicy(object):
+    """Criteria ending a solve before its maximum number of iterations.
+
+    A solve stops once the norm of its residual, which is the distance to
+    the target for a position target, is within residual_tol, or once it
+    has decreased by no more than stall_tol over stall_iterations
+    iterations. It also stops timeout seconds after it started and when the
+    evaluations of the objective and its derivatives reach max_evaluations.
+    Each criterion is off when None.
+
+    The status of the SolveStats tells which criterion ended a solve:
+    'residual', 'stall', 'deadline' or 'budget', besides 'tol' for the step
+    tolerance of the solver and 'maxiter'.
+    """
+
+    def __init__(self, residual_tol=None, stall_iterations=None,
+                 stall_tol=0., timeout=None, max_evaluations=None):
+        """Create a policy from the criteria to apply."""
+        self.residual_tol = residual_tol
+        self.stall_iterations = stall_iterations
+        self.stall_tol = stall_tol
+        self.timeout = timeout
+        self.max_evaluations = max_evaluations
+
+    @property
+    def needs_residual(self):
+        """Whether the criteria look at the residual."""
+        return (self.residual_tol is not None or
+                self.stall_iterations is not None)
+
+    def monitor(self, stats, deadline=None):
+        """Start applying the criteria to a solve recording stats.
+
+        The deadline, an absolute time.perf_counter() value, is combined
+        with the timeout.
+        """
+        return Monitor(self, stats, deadline)
+
+
+class Monitor(object):
+    """The criteria of a policy applied to a single solve."""
+
+    def __init__(self, policy, stats, deadline=None):
+        """Start the clock of the timeout."""
+        self.policy = policy
+        self.stats = stats
+        if policy.timeout is not None:
+            timeout = time.perf_counter() + policy.timeout
+            deadline = timeout if deadline is None else min(deadline, timeout)
+        self.deadline = deadline
+        self.residuals = []
+
+    def exhausted(self):
+        """Return 'deadline' or 'budget' if the solve has to stop, or None.
+
+        It sets the status of the stats as well.
+        """
+        status = None
+        if (self.deadline is not None and
+                time.perf_counter() > self.deadline):
+            status = 'deadline'
+        elif (self.policy.max_evaluations is not None and
+              self.stats.nfev + self.stats.njev >=
+              self.policy.max_evaluations):
+            status = 'budget'
+        if status is not None:
+            self.stats.status = status
+        return status
+
+    def converged(self, residual):
+        """Return 'residual' or 'stall' if the residual ends the solve, or
+        None.
+
+        It is called once per iteration, and sets the status of the stats.
+        """
+        policy = self.policy
+        self.residuals.append(residual)
+        status = None
+        if policy.residual_tol is not None and residual <= policy.residual_tol:
+            status = 'residual'
+        elif (policy.stall_iterations is not None and
+              len(self.residuals) > policy.stall_iterations and
+              self.residuals[-policy.stall_iterations - 1] - residual <=
+              policy.stall_tol):
+            status = 'stall'
+        if status is not None:
+            self.stats.status = status
+        return status
@@ -1,19 +1,29 @@
 """Core features."""
 
 from numbers import Number
+import time
 
-import autograd.numpy as np
+import numpy as np
 
 from .component import Link, Joint
-from .solver import FKSolver, IKSolver
+from .solver import FKSolver, IKSolver, FABRIKSolver
 from .optimizer import ScipyOptimizer
+from . import storage
 
 
 class Actuator(object):
-    """Represents an actuator as a set of links and revolute joints."""
+    """Represents an actuator as a set of links and joints."""
 
-    def __init__(self, tokens, optimizer=None):
-        """Create an actuator from specified link lengths and joint axes."""
+    def __init__(self, tokens, optimizer=None, dtype=float, solver=None):
+        """Create an actuator from specified link lengths and joint axes.
+
+        The dtype, float64 by default or float32 for a compact actuator, is
+        that of the chain parameters and of the joint angles.
+
+        The IK solver is an IKSolver with the optimizer, ScipyOptimizer by
+        default, unless solver is 'fabrik' for a FABRIKSolver, which takes
+        no optimizer and is faster for long chains reaching positions.
+        """
         components = []
         for t in tokens:
             if isinstance(t, Number):
@@ -22,35 +32,90 @@ class Actuator(object):
                 components.append(Link(t))
             elif isinstance(t, str) and t in {'x', 'y', 'z'}:
                 components.append(Joint(t))
+            elif isinstance(t, (Link, Joint)):
+                components.append(t)
             else:
                 raise ValueError(
                     'the arguments need to be '
                     'link length or joint axis: {}'.format(t)
                 )
 
-        self.fk = FKSolver(components)
-        self.ik = IKSolver(
-            self.fk, ScipyOptimizer() if optimizer is None else optimizer)
+        self.fk = FKSolver(components, dtype)
+        if solver is None:
+            self.ik = IKSolver(
+                self.fk, ScipyOptimizer() if optimizer is None else optimizer)
+        elif solver == 'fabrik':
+            if optimizer is not None:
+                raise ValueError('FABRIK takes no optimizer')
+            self.ik = FABRIKSolver(self.fk)
+        else:
+            raise ValueError('unknown solver: {}'.format(solver))
 
-        self.angles = [0.] * len(
-            [c for c in components if isinstance(c, Joint)]
-        )
+        self._angles = np.zeros(len(self.fk.joint_indexes), dtype=dtype)
         self.components = components
 
     @property
     def angles(self):
-        """The joint angles."""
-        return self._angles
+        """The joint angles.
+
+        They are kept in a buffer which assignments update in place, so
+        reading them returns a read-only view of it without copying: writing
+        an element raises ValueError instead of being lost, and the view
+        follows later assignments, so copy it to keep the angles of a
+        moment.
+        """
+        angles = self._angles.view()
+        angles.flags.writeable = False
+        return angles
 
     @angles.setter
     def angles(self, angles):
-        self._angles = np.array(angles)
+        # Updated in place, so the buffer is allocated only once.
+        self._angles[...] = angles
+
+    @property
+    def limits(self):
+        """The lower and upper limits of the joint angles."""
+        return self.fk.limits
 
     @property
     def ee(self):
         """The end-effector position."""
-        return self.fk.solve(self.angles)
+        return self.fk.solve(self._angles)
 
     @ee.setter
     def ee(self, position):
-        self.angles = self.ik.solve(self.angles, position)
+        self.angles = self.ik.solve(self._angles, position)
+
+    def track(self, targets, maxiter=None, timeout=None):
+        """Follow end-effector targets and yield joint angles for each.
+
+        Every solve starts from the current angles and stops after maxiter
+        iterations or timeout seconds, so a step has a bounded latency. The
+        angles are yielded with a flag telling whether they reached the
+        target within the tolerance of the IK solver; when it is false, they
+        are the partial solution found within the budget.
+        """
+        for target in targets:
+            deadline = (None if timeout is None
+                        else time.perf_counter() + timeout)
+            self.angles = self.ik.solve(
+                self._angles, target, maxiter=maxiter, deadline=deadline)
+            yield (self._angles.copy(),
+                   self.ik.error(self._angles, target) < self.ik.tol)
+
+    def save(self, path):
+        """Save the actuator and the state of its IK solver to a directory.
+
+        See tinyik.storage for the format.
+        """
+        storage.save(self, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Load an actuator from a directory written by save.
+
+        The arrays of the workspace and the cache of the IK solver are
+        memory-mapped with mmap_mode, so that processes share them.
+        """
+        return storage.load(path, mmap_mode)
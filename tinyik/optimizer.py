@@ -1,96 +1,432 @@
 """Optimizers."""
 
-import autograd.numpy as np
-import autograd
-import scipy.optimize
+import numpy as np
 
+from .convergence import ConvergencePolicy
+from .stats import Instrumented
+
+
+class _Stop(Exception):
+
+    def __init__(self, x=None):
+        super(_Stop, self).__init__()
+        self.x = x
+
+
+_bounded_methods = {
+    'nelder-mead', 'l-bfgs-b', 'tnc', 'slsqp', 'powell', 'trust-constr'}
+_gradient_methods = {
+    'cg', 'bfgs', 'newton-cg', 'l-bfgs-b', 'tnc', 'slsqp', 'dogleg',
+    'trust-ncg', 'trust-krylov', 'trust-exact', 'trust-constr'}
 
-class NewtonOptimizer(object):
-    """An optimizer based on Newton's method."""
 
-    def __init__(self, tol=1.48e-08, maxiter=50):
+class _GradientOptimizer(Instrumented):
+    """A base class of optimizers using derivatives of an objective.
+
+    Besides the step tolerance tol and maxiter, a solve ends by the criteria
+    of policy, a ConvergencePolicy.
+    """
+
+    def __init__(self, tol, maxiter, policy=None):
         """Generate an optimizer from an objective function."""
+        super(_GradientOptimizer, self).__init__()
         self.tol = tol
         self.maxiter = maxiter
+        self.policy = ConvergencePolicy() if policy is None else policy
+        self.monitor = None
+        self._evaluated = (None, None)
 
-    def prepare(self, f):
-        """Accept an objective function for optimization."""
-        self.g = autograd.grad(f)
-        self.h = autograd.hessian(f)
+    def prepare(self, f, linearize=None, bounds=None):
+        """Accept an objective function for optimization.
+
+        If linearize is given, it has to return the residual whose squared
+        norm is the objective and the Jacobian of the residual. Then the
+        gradient and a Gauss-Newton approximation of the Hessian are derived
+        from them instead of tracing the objective with autograd, which is
+        only imported when it is needed.
+
+        If bounds, a pair of lower and upper limit vectors, is given, every
+        step is projected onto them.
+        """
+        self.f = f
+        self.linearize = linearize
+        self.bounds = bounds
+
+    def iterations(self, maxiter=None, deadline=None):
+        """Count iterations up to maxiter until the deadline has passed or
+        the evaluation budget of the policy is spent.
+
+        The arguments override the maxiter attribute and set an absolute
+        time.perf_counter() deadline for a single optimization, which the
+        timeout of the policy may bring forward.
+        """
+        stats = self.stats
+        stats.status = 'maxiter'
+        self.monitor = self.policy.monitor(stats, deadline)
+        for i in range(self.maxiter if maxiter is None else maxiter):
+            if self.monitor.exhausted():
+                return
+            stats.iterations += 1
+            yield i
+
+    def converged(self, x, target, objective=None):
+        """Tell whether the residual at x ends the solve by the policy.
+
+        The objective at x is evaluated unless it is given or the residual
+        has just been evaluated at x, and only if the policy needs it.
+        """
+        if not self.policy.needs_residual:
+            return False
+        if objective is None:
+            objective = self.last_objective(x, target)
+        return self.monitor.converged(np.sqrt(objective)) is not None
+
+    def last_objective(self, x, target):
+        """Return the objective at x, evaluating it unless the residual has
+        just been evaluated there."""
+        evaluated, r = self._evaluated
+        if evaluated is x:
+            return np.dot(r, r)
+        return self.objective(x, target)
+
+    def descend(self, x, delta, target):
+        """Take a step from x by delta and return the new argument.
+
+        With bounds, the step is projected onto them and halved until the
+        objective decreases, since a projected step may lead uphill even
+        when the step itself does not. If it never decreases, x is
+        returned.
+        """
+        if self.bounds is None:
+            return x + delta
+        objective = self.last_objective(x, target)
+        for _ in range(30):
+            x_new = self.project(x + delta)
+            if self.objective(x_new, target) < objective:
+                return x_new
+            delta = delta / 2.
+        return x
+
+    def project(self, x):
+        """Clip an argument to the bounds."""
+        if self.bounds is None:
+            return x
+        return np.clip(x, *self.bounds)
+
+    def objective(self, x, target):
+        """Evaluate the objective."""
+        self.stats.nfev += 1
+        with self.stats.phase('fk'):
+            return self.f(x, target)
 
-    def optimize(self, x0, target):
+    def residual_jacobian(self, x, target):
+        """Evaluate the residual and its Jacobian."""
+        self.stats.njev += 1
+        with self.stats.phase('fk'):
+            r, j = self.linearize(x, target)
+        self._evaluated = (x, r)
+        return r, j
+
+    def gradient(self, x, target):
+        """Calculate the gradient of the objective."""
+        if self.linearize is None:
+            import autograd
+            self.stats.njev += 1
+            with self.stats.phase('gradient'):
+                return autograd.grad(self.f)(x, target)
+        r, j = self.residual_jacobian(x, target)
+        with self.stats.phase('gradient'):
+            return 2. * np.dot(r, j)
+
+    def gradient_hessian(self, x, target):
+        """Calculate the gradient and the Hessian of the objective."""
+        if self.linearize is None:
+            import autograd
+            self.stats.njev += 1
+            with self.stats.phase('gradient'):
+                return (autograd.grad(self.f)(x, target),
+                        autograd.hessian(self.f)(x, target))
+        r, j = self.residual_jacobian(x, target)
+        with self.stats.phase('gradient'):
+            return 2. * np.dot(r, j), 2. * np.dot(j.T, j)
+
+    def finish(self, x, target, objective=None):
+        """Record the final residual, call the hooks and return x."""
+        if objective is None:
+            objective = self.objective(x, target)
+        self.stats.residual = np.sqrt(objective)
+        self.stats.success = self.stats.status in ('tol', 'residual')
+        self._evaluated = (None, None)
+        self.end_stats()
+        return x
+
+
+class NewtonOptimizer(_GradientOptimizer):
+    """An optimizer based on Newton's method."""
+
+    def __init__(self, tol=1.48e-08, maxiter=50, policy=None):
+        """Generate an optimizer from an objective function."""
+        super(NewtonOptimizer, self).__init__(tol, maxiter, policy)
+
+    def optimize(self, x0, target, maxiter=None, deadline=None):
         """Calculate an optimum argument of an objective function."""
-        x = x0
-        for _ in range(self.maxiter):
-            delta = np.linalg.solve(self.h(x, target), -self.g(x, target))
-            x = x + delta
+        self.begin_stats()
+        x = self.project(x0)
+        for _ in self.iterations(maxiter, deadline):
+            g, h = self.gradient_hessian(x, target)
+            if self.converged(x, target):
+                break
+            with self.stats.phase('solve'):
+                delta = np.linalg.lstsq(h, -g, rcond=None)[0]
+            x_new = self.descend(x, delta, target)
+            delta, x = x_new - x, x_new
             if np.linalg.norm(delta) < self.tol:
+                self.stats.status = 'tol'
                 break
-        return x
+        return self.finish(x, target)
 
 
-class SteepestDescentOptimizer(object):
+class SteepestDescentOptimizer(_GradientOptimizer):
     """An optimizer based on steepest descent method."""
 
-    def __init__(self, tol=1.48e-08, maxiter=50, alpha=1):
+    def __init__(self, tol=1.48e-08, maxiter=50, alpha=1, policy=None):
         """Generate an optimizer from an objective function."""
-        self.tol = tol
-        self.maxiter = maxiter
+        super(SteepestDescentOptimizer, self).__init__(tol, maxiter, policy)
         self.alpha = alpha
 
-    def prepare(self, f):
-        """Accept an objective function for optimization."""
-        self.g = autograd.grad(f)
-
-    def optimize(self, x0, target):
+    def optimize(self, x0, target, maxiter=None, deadline=None):
         """Calculate an optimum argument of an objective function."""
-        x = x0
-        for _ in range(self.maxiter):
-            delta = self.alpha * self.g(x, target)
-            x = x - delta
+        self.begin_stats()
+        x = self.project(x0)
+        for _ in self.iterations(maxiter, deadline):
+            g = self.gradient(x, target)
+            if self.converged(x, target):
+                break
+            x_new = self.project(x - self.alpha * g)
+            delta, x = x - x_new, x_new
             if np.linalg.norm(delta) < self.tol:
+                self.stats.status = 'tol'
                 break
-        return x
+        return self.finish(x, target)
 
 
-class ConjugateGradientOptimizer(object):
+class ConjugateGradientOptimizer(_GradientOptimizer):
     """An optimizer based on conjugate gradient method."""
 
-    def __init__(self, tol=1.48e-08, maxiter=50):
+    def __init__(self, tol=1.48e-08, maxiter=50, policy=None):
         """Generate an optimizer from an objective function."""
-        self.tol = tol
-        self.maxiter = maxiter
+        super(ConjugateGradientOptimizer, self).__init__(tol, maxiter, policy)
+
+    def optimize(self, x0, target, maxiter=None, deadline=None):
+        """Calculate an optimum argument of an objective function."""
+        self.begin_stats()
+        x = self.project(x0)
+        for i in self.iterations(maxiter, deadline):
+            g, h = self.gradient_hessian(x, target)
+            if self.converged(x, target):
+                break
+            with self.stats.phase('solve'):
+                if i == 0:
+                    alpha = 0
+                    m = g
+                else:
+                    alpha = (- np.dot(m, np.dot(h, g)) /
+                             np.dot(m, np.dot(h, m)))
+                    m = g + np.dot(alpha, m)
+                t = - np.dot(m, g) / np.dot(m, np.dot(h, m))
+            x_new = self.descend(x, np.dot(t, m), target)
+            delta, x = x_new - x, x_new
+            if np.linalg.norm(delta) < self.tol:
+                self.stats.status = 'tol'
+                break
+        return self.finish(x, target)
+
 
-    def prepare(self, f):
+class DampedLeastSquaresOptimizer(_GradientOptimizer):
+    """An optimizer based on damped least squares (Levenberg-Marquardt)."""
+
+    def __init__(self, tol=1.48e-08, maxiter=50, damping=1e-3, factor=10.,
+                 max_step=.5, policy=None):
+        """Generate an optimizer from an objective function."""
+        super(DampedLeastSquaresOptimizer, self).__init__(
+            tol, maxiter, policy)
+        self.damping = damping
+        self.factor = factor
+        self.max_step = max_step
+
+    def prepare(self, f, linearize=None, bounds=None):
         """Accept an objective function for optimization."""
-        self.g = autograd.grad(f)
-        self.h = autograd.hessian(f)
+        if linearize is None:
+            raise ValueError(
+                'damped least squares needs the residual and its Jacobian')
+        super(DampedLeastSquaresOptimizer, self).prepare(
+            f, linearize, bounds)
 
-    def optimize(self, x0, target):
+    def optimize(self, x0, target, maxiter=None, deadline=None):
         """Calculate an optimum argument of an objective function."""
-        x = x0
-        for i in range(self.maxiter):
-            g = self.g(x, target)
-            h = self.h(x, target)
-            if i == 0:
-                alpha = 0
-                m = g
+        self.begin_stats()
+        x = self.project(x0)
+        r, j = self.residual_jacobian(x, target)
+        cost = np.dot(r, r)
+        damping = self.damping
+        for _ in self.iterations(maxiter, deadline):
+            if self.converged(x, target, cost):
+                break
+            with self.stats.phase('solve'):
+                jj = np.dot(j, j.T) + damping * np.eye(len(r))
+                delta = -np.dot(j.T, np.linalg.solve(jj, r))
+            norm = np.linalg.norm(delta)
+            if norm > self.max_step:
+                delta = delta * (self.max_step / norm)
+            delta = self.project(x + delta) - x
+            r_new, j_new = self.residual_jacobian(x + delta, target)
+            cost_new = np.dot(r_new, r_new)
+            if cost_new < cost:
+                x, r, j, cost = x + delta, r_new, j_new, cost_new
+                damping = damping / self.factor
             else:
-                alpha = - np.dot(m, np.dot(h, g)) / np.dot(m, np.dot(h, m))
-                m = g + np.dot(alpha, m)
-            t = - np.dot(m, g) / np.dot(m, np.dot(h, m))
-            delta = np.dot(t, m)
-            x = x + delta
-            if np.linalg.norm(delta) < self.tol:
+                damping = damping * self.factor
+            if norm < self.tol or cost == 0.:
+                self.stats.status = 'tol'
                 break
-        return x
+        return self.finish(x, target, cost)
+
 
+class NullSpaceOptimizer(DampedLeastSquaresOptimizer):
+    """A damped least squares optimizer with secondary objectives.
 
-class ScipyOptimizer(object):
-    """An optimizer based on scipy.optimize.minimize."""
+    Every step reaches for the target by damped least squares and descends
+    the secondary objectives projected onto the null space of the Jacobian,
+    so redundant joints serve them without pulling the task frames away
+    from their targets. The objectives are weighted by centering, keeping
+    joints with both limits in the middle of them, smooth_factor, keeping
+    the angles close to the initial ones (a scalar or a weight per joint),
+    and manipulability, keeping away from singular configurations, which
+    takes a linearization per joint to differentiate.
+    """
 
-    def __init__(self, **optimizer_opt):
+    def __init__(self, tol=1.48e-08, maxiter=50, damping=1e-3, factor=10.,
+                 max_step=.5, centering=0., smooth_factor=0.,
+                 manipulability=0., policy=None):
         """Generate an optimizer from an objective function."""
+        super(NullSpaceOptimizer, self).__init__(
+            tol, maxiter, damping, factor, max_step, policy)
+        self.centering = centering
+        self.smooth_factor = smooth_factor
+        self.manipulability = manipulability
+
+    def secondary(self, x, x0, target, j):
+        """Calculate the secondary objective and its gradient."""
+        cost, gradient = 0., np.zeros(len(x))
+        if self.centering and self.bounds is not None:
+            lower, upper = self.bounds
+            limited = np.isfinite(lower) & np.isfinite(upper)
+            lower = np.where(limited, lower, 0.)
+            upper = np.where(limited, upper, 1.)
+            d = np.where(limited, x - (lower + upper) / 2., 0.)
+            cost += self.centering * np.sum((d / (upper - lower)) ** 2)
+            gradient += 2. * self.centering * d / (upper - lower) ** 2
+        if np.any(self.smooth_factor):
+            if np.ndim(self.smooth_factor) and (
+                    len(self.smooth_factor) != len(x)):
+                raise ValueError('len(smooth_factor) != number of joints')
+            a = x - x0
+            cost += np.sum(self.smooth_factor * np.power(a, 2))
+            gradient += 2. * np.multiply(self.smooth_factor, a)
+        if self.manipulability:
+            w = _manipulability(j)
+            step = 1e-6
+            for i in range(len(x)):
+                e = np.zeros(len(x))
+                e[i] = step
+                _, j_i = self.residual_jacobian(x + e, target)
+                gradient[i] -= self.manipulability * (
+                    _manipulability(j_i) - w) / step
+            cost -= self.manipulability * w
+        return cost, gradient
+
+    def optimize(self, x0, target, maxiter=None, deadline=None):
+        """Calculate an optimum argument of an objective function.
+
+        The target comes first. Every iteration tries the damped least
+        squares step alone and with the null space term, clipped to max_step
+        on its own, and takes the one with the lower secondary objective
+        among those which do not increase the residual, where the one with
+        the term also has to achieve half the decrease of the other. So the
+        secondary objectives steer the solve while it converges, and never
+        at the expense of the target.
+        """
+        self.begin_stats()
+        start = x = self.project(x0)
+        r, j = self.residual_jacobian(x, target)
+        cost = np.dot(r, r)
+        h, g = self.secondary(x, start, target, j)
+        damping = self.damping
+        for _ in self.iterations(maxiter, deadline):
+            if self.converged(x, target, cost):
+                break
+            with self.stats.phase('solve'):
+                jj = np.dot(j, j.T) + damping * np.eye(len(r))
+                pinv = np.linalg.solve(jj, j).T
+                primary = _clip_norm(-np.dot(pinv, r), self.max_step)
+                secondary = _clip_norm(
+                    -np.dot(np.eye(len(x)) - np.dot(pinv, j), g),
+                    self.max_step)
+            delta = self.project(x + primary) - x
+            norm = np.linalg.norm(delta)
+            r_new, j_new = self.residual_jacobian(x + delta, target)
+            cost_new = np.dot(r_new, r_new)
+            best = None
+            if cost_new <= cost:
+                best = (delta, r_new, j_new, cost_new) + self.secondary(
+                    x + delta, start, target, j_new)
+                damping = damping / self.factor
+            else:
+                damping = damping * self.factor
+            if np.any(secondary):
+                delta = self.project(x + primary + secondary) - x
+                r_new, j_new = self.residual_jacobian(x + delta, target)
+                cost_new = np.dot(r_new, r_new)
+                required = cost if best is None else (cost + best[3]) / 2.
+                if cost_new <= required:
+                    h_new, g_new = self.secondary(
+                        x + delta, start, target, j_new)
+                    if best is None or h_new < best[4]:
+                        best = (delta, r_new, j_new, cost_new, h_new, g_new)
+            if best is not None:
+                delta, r, j, cost, h, g = best
+                x = x + delta
+                norm = np.linalg.norm(delta)
+            if norm < self.tol:
+                self.stats.status = 'tol'
+                break
+        return self.finish(x, target, cost)
+
+
+def _clip_norm(v, limit):
+    norm = np.linalg.norm(v)
+    return v * (limit / norm) if norm > limit else v
+
+
+def _manipulability(j):
+    # The product of the singular values, which is sqrt(det(J J^T)) for a
+    # Jacobian of full row rank.
+    return np.prod(np.linalg.svd(j, compute_uv=False))
+
+
+class ScipyOptimizer(Instrumented):
+    """An optimizer based on scipy.optimize.minimize.
+
+    Besides the tolerances of scipy, a solve ends by the criteria of policy,
+    a ConvergencePolicy, which are checked at every evaluation for the
+    deadline and the evaluation budget and at every iteration for the
+    residual.
+    """
+
+    def __init__(self, policy=None, **optimizer_opt):
+        """Generate an optimizer from an objective function."""
+        super(ScipyOptimizer, self).__init__()
+        self.policy = ConvergencePolicy() if policy is None else policy
         for k, v in [  # default values
                 ('method', 'BFGS'),
                 ('tol', 1.48e-08),
@@ -99,25 +435,113 @@ class ScipyOptimizer(object):
                 optimizer_opt[k] = v
         self.optimizer_opt = optimizer_opt
 
-    def prepare(self, f):
-        """Accept an objective function for optimization."""
+    def prepare(self, f, linearize=None, bounds=None):
+        """Accept an objective function for optimization.
+
+        If linearize is given, methods using gradients get the gradient
+        derived from the residual and its Jacobian as jac, unless
+        optimizer_opt has one, instead of estimating it by finite
+        differences.
+
+        If bounds are given and optimizer_opt has none, they are passed to
+        scipy, and methods which cannot handle bounds fall back to L-BFGS-B.
+        """
         self.f = f
+        self.linearize = linearize
+        self.bounds = bounds
 
-    def optimize(self, angles0, target):
+    def optimize(self, angles0, target, maxiter=None, deadline=None):
         """Calculate an optimum argument of an objective function."""
         def new_objective(angles):
             return self.f(angles, target)
 
-        return scipy.optimize.minimize(
-            new_objective,
-            angles0,
-            **self.optimizer_opt).x
+        return self._minimize(
+            new_objective, angles0, target, maxiter, deadline)
+
+    def _objective_gradient(self, angles, target):
+        # The objective and its gradient from a single linearization.
+        r, j = self.linearize(angles, target)
+        return np.dot(r, r), 2. * np.dot(r, j)
+
+    def _minimize(self, objective, angles0, target, maxiter=None,
+                  deadline=None, gradient=None):
+        import scipy.optimize
+        stats = self.begin_stats()
+        optimizer_opt = dict(self.optimizer_opt)
+        if self.bounds is not None and optimizer_opt.get('bounds') is None:
+            optimizer_opt['bounds'] = [
+                (lo if np.isfinite(lo) else None,
+                 hi if np.isfinite(hi) else None)
+                for lo, hi in zip(*self.bounds)]
+            if optimizer_opt['method'].lower() not in _bounded_methods:
+                optimizer_opt['method'] = 'L-BFGS-B'
+            angles0 = np.clip(angles0, *self.bounds)
+        if maxiter is not None:
+            optimizer_opt['options'] = dict(
+                optimizer_opt.get('options') or {}, maxiter=maxiter)
+
+        jac = (self.linearize is not None and 'jac' not in optimizer_opt and
+               optimizer_opt['method'].lower() in _gradient_methods)
+        if jac:
+            if gradient is None:
+                def gradient(angles):
+                    return self._objective_gradient(angles, target)
+            optimizer_opt['jac'] = True
+        best = [np.inf, angles0]
+        monitor = self.policy.monitor(stats, deadline)
+
+        def timed_objective(angles):
+            if monitor.exhausted():
+                raise _Stop()
+            stats.nfev += 1
+            with stats.phase('fk'):
+                value = gradient(angles) if jac else objective(angles)
+            f = value[0] if jac else value
+            if f < best[0]:
+                best[:] = f, np.array(angles)
+            return value
+
+        if self.policy.needs_residual:
+            user_callback = optimizer_opt.get('callback')
+
+            def callback(angles, *args):
+                if user_callback is not None:
+                    user_callback(angles, *args)
+                stats.iterations += 1
+                stats.nfev += 1
+                with stats.phase('fk'):
+                    residual = np.sqrt(self.f(angles, target))
+                if monitor.converged(residual):
+                    raise _Stop(np.array(angles))
+
+            optimizer_opt['callback'] = callback
+
+        try:
+            result = scipy.optimize.minimize(
+                timed_objective,
+                angles0,
+                **optimizer_opt)
+        except _Stop as stop:
+            x = best[1] if stop.x is None else stop.x
+            stats.success = stats.status == 'residual'
+        else:
+            x = result.x
+            stats.result = result
+            stats.iterations = getattr(result, 'nit', 0)
+            stats.njev = getattr(result, 'njev', stats.nfev if jac else 0)
+            stats.message = result.message
+            stats.success = bool(result.success)
+            stats.status = 'tol' if result.success else 'maxiter'
+        with stats.phase('fk'):
+            stats.residual = np.sqrt(self.f(x, target))
+        self.end_stats()
+        return x
 
 
 class ScipySmoothOptimizer(ScipyOptimizer):
     """A smooth optimizer based on scipy.optimize.minimize."""
 
-    def __init__(self, smooth_factor=.1, **optimizer_opt):
+    def __init__(self, smooth_factor=.1, policy=None, **optimizer_opt):
         """Generate an optimizer from an objective function."""
         self.smooth_factor = smooth_factor
         for k, v in [  # default values
@@ -125,9 +549,9 @@ class ScipySmoothOptimizer(ScipyOptimizer):
                 ('bounds', None)]:
             if k not in optimizer_opt:
                 optimizer_opt[k] = v
-        super(ScipySmoothOptimizer, self).__init__(**optimizer_opt)
+        super(ScipySmoothOptimizer, self).__init__(policy, **optimizer_opt)
 
-    def optimize(self, angles0, target):
+    def optimize(self, angles0, target, maxiter=None, deadline=None):
         """Calculate an optimum argument of an objective function."""
         def new_objective(angles):
             a = angles - angles0
@@ -141,7 +565,15 @@ class ScipySmoothOptimizer(ScipyOptimizer):
                 return (self.f(angles, target) +
                         self.smooth_factor * np.sum(np.power(a, 2)))
 
-        return scipy.optimize.minimize(
-            new_objective,
-            angles0,
-            **self.optimizer_opt).x
+        def new_gradient(angles):
+            a = angles - angles0
+            if (isinstance(self.smooth_factor, (np.ndarray, list)) and
+                    len(a) != len(self.smooth_factor)):
+                raise ValueError('len(smooth_factor) != number of joints')
+            value, gradient = self._objective_gradient(angles, target)
+            return (value + np.sum(self.smooth_factor * np.power(a, 2)),
+                    gradient + 2. * np.multiply(self.smooth_factor, a))
+
+        return self._minimize(
+            new_objective, angles0, target, maxiter, deadline,
+            new_gradient)
@@ -0,0 +1,71 @@
+"""A process pool for solving independent IK targets."""
+
+import multiprocessing
+import os
+
+import numpy as np
+
+
+_actuator = None
+
+
+def _initialize(actuator):
+    global _actuator
+    _actuator = actuator
+
+
+def _solve(args):
+    targets, angles0, warm_start = args
+    return _actuator.ik.solve_many(targets, angles0, warm_start)
+
+
+class IKPool(object):
+    """Solves IK for many targets in worker processes."""
+
+    def __init__(self, actuator, processes=None, chunksize=None):
+        """Start worker processes, each with its own copy of an actuator."""
+        self.actuator = actuator
+        self.processes = processes or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self._pool = multiprocessing.Pool(
+            self.processes, _initialize, (actuator,))
+
+    def solve(self, targets, angles0=None, warm_start=True):
+        """Calculate joint angles for targets and return them in order.
+
+        The targets are split into chunks solved by solve_many of the IK
+        solver, an IKSolver or a FABRIKSolver, so the angles come with
+        convergence flags and each chunk starts from angles0, the current
+        angles of the actuator by default. If angles0 has a row per target,
+        each chunk gets its own rows.
+        """
+        targets = list(targets)
+        if angles0 is None:
+            angles0 = self.actuator.angles
+        angles0 = np.array(angles0, dtype=float)
+        if angles0.ndim == 2 and len(angles0) != len(targets):
+            raise ValueError(
+                'the number of rows of angles0 needs to be '
+                'the number of targets: {}'.format(len(angles0)))
+        chunksize = self.chunksize or max(
+            1, -(-len(targets) // (self.processes * 4)))
+        results = self._pool.map(_solve, [
+            (targets[i:i + chunksize],
+             angles0[i:i + chunksize] if angles0.ndim == 2 else angles0,
+             warm_start)
+            for i in range(0, len(targets), chunksize)])
+        if not results:
+            return np.empty((0, len(angles0))), np.empty(0, dtype=bool)
+        return (np.concatenate([a for a, _ in results]),
+                np.concatenate([c for _, c in results]))
+
+    def close(self):
+        """Wait for the workers to finish and stop them."""
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
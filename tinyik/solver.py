@@ -1,123 +1,709 @@
 """Solvers."""
 
-from functools import reduce
+import math
 import sys
 
-import autograd.numpy as np
+import numpy as np
 
+from .backend import array_module
+from .chain import Chain
 from .component import Joint
+from .convergence import ConvergencePolicy
+from .stats import Instrumented
 
 
 class FKSolver(object):
     """A forward kinematics solver."""
 
-    def __init__(self, components):
-        """Generate a FK solver from link and joint instances."""
-        joint_indexes = [
+    def __init__(self, components, dtype=float, backend='auto'):
+        """Generate a FK solver from link and joint instances.
+
+        The dtype, float64 by default or float32, is that of the compiled
+        chain and of the positions it calculates.
+
+        The backend, 'auto' by default, 'numpy' or 'autograd', selects how
+        the chain is evaluated. With 'auto', plain angles are evaluated with
+        NumPy reusing buffers and writing to out where given, and angles
+        traced by autograd with autograd.numpy.
+        """
+        self.chain = Chain(components, dtype, backend)
+        self.components = components
+        self.joint_indexes = [
             i for i, c in enumerate(components) if isinstance(c, Joint)
         ]
 
-        def matrices(angles):
-            joints = dict(zip(joint_indexes, angles))
-            a = [joints.get(i, None) for i in range(len(components))]
-            return [c.matrix(a[i]) for i, c in enumerate(components)]
+    @property
+    def limits(self):
+        """The lower and upper limits of the joint angles."""
+        return self.chain.lower, self.chain.upper
 
-        self._matrices = matrices
-
-    def solve(self, angles):
+    def solve(self, angles, out=None):
         """Calculate a position of the end-effector and return it."""
-        return reduce(
-            lambda a, m: np.dot(m, a),
-            reversed(self._matrices(angles)),
-            np.array([0., 0., 0., 1.])
-        )[:3]
+        return self.chain.solve(angles, out)
+
+    def solve_batch(self, angles, out=None):
+        """Calculate positions of the end-effector for rows of angles."""
+        angles = np.reshape(np.asarray(angles, dtype=float),
+                            (-1, len(self.joint_indexes)))
+        return self.chain.solve_batch(angles, out)
+
+    def linearize(self, angles):
+        """Calculate the end-effector position and its Jacobian."""
+        return self.chain.linearize(angles)
+
+    def jacobian(self, angles):
+        """Calculate the Jacobian of the end-effector position."""
+        return self.chain.linearize(angles)[1]
+
+    def poses(self, angles, indexes):
+        """Calculate 4x4 poses of components and return them."""
+        return self.chain.poses(angles, indexes)
+
+    def poses_batch(self, angles, indexes):
+        """Calculate 4x4 poses of components for rows of angles."""
+        angles = np.reshape(np.asarray(angles, dtype=float),
+                            (-1, len(self.joint_indexes)))
+        return self.chain.poses_batch(angles, indexes)
+
+    def linearize_poses(self, angles, indexes):
+        """Calculate 4x4 poses of components and their 6xJ Jacobians."""
+        return self.chain.linearize_poses(angles, indexes)
+
+
+def _quaternion_matrix(q):
+    w, x, y, z = q / np.linalg.norm(q)
+    return np.array([
+        [1. - 2. * (y * y + z * z), 2. * (x * y - z * w),
+         2. * (x * z + y * w)],
+        [2. * (x * y + z * w), 1. - 2. * (x * x + z * z),
+         2. * (y * z - x * w)],
+        [2. * (x * z - y * w), 2. * (y * z + x * w),
+         1. - 2. * (x * x + y * y)]
+    ])
+
+
+def _split_target(target):
+    if isinstance(target, (tuple, list)) and len(target) == 2:
+        position, rotation = target
+        rotation = np.asarray(rotation, dtype=float)
+        if rotation.shape == (4,):
+            rotation = _quaternion_matrix(rotation)
+        return np.asarray(position, dtype=float), rotation
+    target = np.asarray(target, dtype=float)
+    if target.shape == (4, 4):
+        return target[:3, 3], target[:3, :3]
+    return target, None
+
+
+def _orientation_error(rotation, target):
+    # Half the sum of the cross products of the axes, which is zero when the
+    # rotations are aligned and the rotation vector between them when close.
+    xp = array_module(rotation)
+    return -.5 * xp.sum(xp.cross(rotation.T, target.T), axis=0)
+
+
+def _solve_many(solve, goals, angles0, warm_start):
+    # Solve goals in order from angles0 or its rows. The solve callable
+    # returns None for a goal it leaves unsolved, which keeps its seed and
+    # does not warm start the next solve, as a solution with NaNs does not.
+    angles0 = np.array(angles0, dtype=float)
+    if angles0.ndim == 2 and len(angles0) != len(goals):
+        raise ValueError(
+            'the number of rows of angles0 needs to be '
+            'the number of targets: {}'.format(len(angles0)))
+    seeds = angles0 if angles0.ndim == 2 else None
+    angles = np.empty((len(goals), angles0.shape[-1]))
+    x = angles0
+    for i, goal in enumerate(goals):
+        if seeds is not None:
+            x = seeds[i]
+        solution = solve(x, goal)
+        if solution is None:
+            angles[i] = x
+            continue
+        angles[i] = solution
+        if warm_start and np.all(np.isfinite(angles[i])):
+            x = angles[i]
+    return angles
+
+
+class _Goal(object):
+    """Target positions and rotations of task frames."""
+
+    def __init__(self, indexes, weights, orientation_weight, targets):
+        self.indexes = indexes
+        self.weights = weights
+        self.orientation_weight = orientation_weight
+        self.targets = [_split_target(t) for t in targets]
+
+    def key(self):
+        return b''.join(
+            p.tobytes() + (b'' if rot is None else rot.tobytes())
+            for p, rot in self.targets)
+
+    def residual(self, poses):
+        xp = array_module(poses)
+        r = []
+        for pose, w, (p, rot) in zip(poses, self.weights, self.targets):
+            r.append(w * (pose[:3, 3] - p))
+            if rot is not None:
+                r.append(w * self.orientation_weight *
+                         _orientation_error(pose[:3, :3], rot))
+        return xp.concatenate(r)
+
+    def linearize(self, poses, jacobians):
+        r, j = [], []
+        for pose, jac, w, (p, rot) in zip(
+                poses, jacobians, self.weights, self.targets):
+            r.append(w * (pose[:3, 3] - p))
+            j.append(w * jac[:3])
+            if rot is not None:
+                w = w * self.orientation_weight
+                m = pose[:3, :3]
+                r.append(w * _orientation_error(m, rot))
+                d = .5 * (np.trace(np.dot(m.T, rot)) * np.eye(3) -
+                          np.dot(m, rot.T))
+                j.append(w * np.dot(d, jac[3:]))
+        return np.concatenate(r), np.concatenate(j)
 
 
 class IKSolver(object):
     """An inverse kinematics solver."""
 
-    def __init__(self, fk_solver, optimizer):
-        """Generate an IK solver from a FK solver instance."""
-        def distance_squared(angles, target):
-            x = target - fk_solver.solve(angles)
-            return np.sum(np.power(x, 2))
+    def __init__(self, fk_solver, optimizer, tol=1e-6, frames=None,
+                 weights=None, orientation_weight=1., cache=None,
+                 workspace=None):
+        """Generate an IK solver from a FK solver instance.
 
-        optimizer.prepare(distance_squared)
+        A target is a position, a 4x4 pose, or a pair of a position and a
+        rotation given as a 3x3 matrix or a (w, x, y, z) quaternion. By
+        default it is for the end-effector. If frames, a list of component
+        indexes, is given, a target is a list with one of them per frame,
+        and the residuals of the frames are scaled by weights.
+
+        If a SolutionCache is given as cache, converged solutions are stored
+        in it. A cached target is answered without solving, and the solution
+        of the nearest cached position otherwise becomes the initial angles
+        if it is closer to the target. An answer from the cache is reported
+        to the stats and hooks of the optimizer with status 'cache' and no
+        iterations.
+
+        If a Workspace is given as workspace, end-effector targets out of it
+        are rejected at once, and the seed of its voxel replaces the initial
+        angles when it is closer to the target.
+        """
+        if frames is not None and weights is None:
+            weights = [1.] * len(frames)
+        self.frames = frames
+        self.weights = weights
+        self.orientation_weight = orientation_weight
+        self.tol = tol
+        self.cache = cache
+        self.workspace = workspace
+        self._fk_solver = fk_solver
+
+        bounds = getattr(fk_solver, 'limits', None)
+        if bounds is not None and not np.any(np.isfinite(bounds)):
+            bounds = None
+        optimizer.prepare(
+            self.distance_squared,
+            self.linearize if hasattr(fk_solver, 'linearize') else None,
+            bounds)
         self.optimizer = optimizer
 
-    def solve(self, angles0, target):
-        """Calculate joint angles and returns it."""
-        return self.optimizer.optimize(np.array(angles0), target)
+    def distance_squared(self, angles, target):
+        """Calculate the squared residual of the task frames."""
+        if isinstance(target, _Goal):
+            x = target.residual(
+                self._fk_solver.poses(angles, target.indexes))
+        else:
+            x = target - self._fk_solver.solve(angles)
+        xp = array_module(x)
+        return xp.sum(xp.power(x, 2))
+
+    def linearize(self, angles, target):
+        """Calculate the residual of the task frames and its Jacobian."""
+        if isinstance(target, _Goal):
+            return target.linearize(
+                *self._fk_solver.linearize_poses(angles, target.indexes))
+        position, jacobian = self._fk_solver.linearize(angles)
+        return position - target, jacobian
+
+    def solve(self, angles0, target, maxiter=None, deadline=None):
+        """Calculate joint angles and returns it.
+
+        If maxiter or deadline, an absolute time.perf_counter() value, is
+        given, the optimizer stops there and may return a partial solution.
+        """
+        goal = self._goal(target)
+        if not self._reachable(goal):
+            raise ValueError(
+                'the target is out of the workspace: {}'.format(target))
+        # Optimize in float64 even for float32 angles of a compact actuator.
+        return self._solve(
+            np.array(angles0, dtype=float), goal, maxiter, deadline)
+
+    @property
+    def stats(self):
+        """The SolveStats of the last optimization."""
+        return getattr(self.optimizer, 'stats', None)
+
+    def error(self, angles, target):
+        """Calculate the norm of the residual of joint angles for a target."""
+        return np.sqrt(self.distance_squared(angles, self._goal(target)))
+
+    def solve_many(self, targets, angles0=None, warm_start=True):
+        """Calculate joint angles for a sequence of targets and return them.
+
+        Each solve starts from the previous solution if warm_start is true,
+        or from angles0 otherwise. If angles0 has a row per target, each row
+        seeds its own solve instead. Along with the angles, it returns flags
+        telling whether the residual of each target is within tol. Targets
+        out of the workspace are not solved and keep the initial angles.
+        """
+        goals = [self._goal(t) for t in targets]
+        if angles0 is None:
+            angles0 = np.zeros(len(self._fk_solver.joint_indexes))
+
+        def solve(x, goal):
+            return self._solve(x, goal) if self._reachable(goal) else None
+
+        angles = _solve_many(solve, goals, angles0, warm_start)
+        if goals and not any(isinstance(g, _Goal) for g in goals):
+            errors = np.linalg.norm(
+                self._fk_solver.solve_batch(angles) - goals, axis=1)
+        else:
+            errors = np.sqrt([
+                self.distance_squared(a, g) for a, g in zip(angles, goals)])
+        return angles, errors < self.tol
+
+    def solve_multistart(self, angles0, target, starts=8, strategy='random',
+                         seeds=None, random_state=None):
+        """Calculate joint angles from several initial angles.
+
+        The initial angles are angles0 followed by seeds if given, or by
+        starts - 1 angles drawn by strategy, 'random' or 'stratified' (a
+        Latin hypercube), within the joint limits or a full turn. They are
+        ranked by their residual in one batch and solved in that order until
+        one converges within tol. It returns the best angles and the norm of
+        their residual.
+        """
+        goal = self._goal(target)
+        if not self._reachable(goal):
+            raise ValueError(
+                'the target is out of the workspace: {}'.format(target))
+        angles0 = np.array(angles0, dtype=float)
+        lower, upper = self._fk_solver.chain.ranges()
+        if seeds is None:
+            rs = np.random.RandomState(random_state)
+            shape = (starts - 1, len(angles0))
+            if strategy == 'random':
+                seeds = rs.uniform(lower, upper, shape)
+            elif strategy == 'stratified':
+                strata = np.argsort(rs.uniform(size=shape), axis=0)
+                seeds = lower + (upper - lower) * (
+                    strata + rs.uniform(size=shape)) / max(shape[0], 1)
+            else:
+                raise ValueError('unknown strategy: {}'.format(strategy))
+        seeds = np.concatenate(
+            [angles0[None], np.reshape(seeds, (-1, len(angles0)))])
+
+        if isinstance(goal, _Goal):
+            residuals = [self.distance_squared(a, goal) for a in seeds]
+        else:
+            residuals = np.sum(
+                (self._fk_solver.solve_batch(seeds) - goal) ** 2, axis=1)
+        best, best_residual = None, np.inf
+        for seed in seeds[np.argsort(residuals)]:
+            angles = self.optimizer.optimize(seed, goal)
+            residual = np.sqrt(self.distance_squared(angles, goal))
+            if residual < best_residual:
+                best, best_residual = angles, residual
+            if residual < self.tol:
+                break
+        return best, best_residual
+
+    def reachable(self, target):
+        """Tell whether a target is within the workspace, if there is one.
+
+        Unreachable targets make solve raise ValueError and are left
+        unsolved by solve_many.
+        """
+        return self._reachable(self._goal(target))
+
+    def _reachable(self, goal):
+        if self.workspace is None or self.frames is not None:
+            return True
+        return self.workspace.reachable(self._position(goal))
+
+    def _solve(self, angles0, goal, maxiter=None, deadline=None):
+        if self.cache is not None:
+            key, position = self._key(goal), self._position(goal)
+            angles = self.cache.get(key)
+            if angles is not None:
+                self._report_cache_hit(angles, goal)
+                return angles
+            nearest = self.cache.nearest(position)
+            if nearest is not None and (
+                    self.distance_squared(nearest, goal) <
+                    self.distance_squared(angles0, goal)):
+                angles0 = nearest
+                self.cache.near_hits += 1
+        if self.workspace is not None and self.frames is None:
+            seed = self.workspace.seed(self._position(goal))
+            if seed is not None and (self.distance_squared(seed, goal) <
+                                     self.distance_squared(angles0, goal)):
+                angles0 = seed
+        budget = {}
+        if maxiter is not None:
+            budget['maxiter'] = maxiter
+        if deadline is not None:
+            budget['deadline'] = deadline
+        angles = self.optimizer.optimize(angles0, goal, **budget)
+        if (self.cache is not None and
+                self.distance_squared(angles, goal) < self.tol ** 2):
+            self.cache.put(key, position, angles)
+        return angles
+
+    def _report_cache_hit(self, angles, goal):
+        begin_stats = getattr(self.optimizer, 'begin_stats', None)
+        if begin_stats is None:
+            return
+        stats = begin_stats()
+        stats.status = 'cache'
+        stats.success = True
+        stats.residual = np.sqrt(float(self.distance_squared(angles, goal)))
+        self.optimizer.end_stats()
+
+    def _key(self, goal):
+        return goal.key() if isinstance(goal, _Goal) else goal.tobytes()
+
+    def _position(self, goal):
+        return goal.targets[0][0] if isinstance(goal, _Goal) else goal
+
+    def _goal(self, target):
+        if self.frames is None:
+            position, rotation = _split_target(target)
+            if rotation is None:
+                return position
+            return _Goal([-1], [1.], self.orientation_weight, [target])
+        if len(self.frames) == 1:
+            target = [target]
+        if len(target) != len(self.frames):
+            raise ValueError(
+                'the number of targets needs to be '
+                'the number of frames: {}'.format(len(target)))
+        return _Goal(
+            self.frames, self.weights, self.orientation_weight, target)
 
 
 class CCDFKSolver(object):
 
-    def __init__(self, components):
-        joint_indexes = [
+    def __init__(self, components, dtype=float):
+        self.chain = Chain(components, dtype)
+        self.components = components
+        self.joint_indexes = [
             i for i, c in enumerate(components) if isinstance(c, Joint)
         ]
+        self.reset(np.zeros(len(self.joint_indexes)))
 
-        def matrices(angles):
-            joints = dict(zip(joint_indexes, angles))
-            a = [joints.get(i, None) for i in range(len(components))]
-            return [c.matrix(a[i]) for i, c in enumerate(components)]
-
-        self._matrices = matrices
-        self.components = components
-        self.joint_indexes = joint_indexes
+    @property
+    def limits(self):
+        """The lower and upper limits of the joint angles."""
+        return self.chain.lower, self.chain.upper
 
     def solve(self, angles, p=None, index=None):
         if p is None:
             p = [0., 0., 0., 1.]
         if index is None:
             index = len(self.components) - 1
-        return reduce(
-            lambda a, m: np.dot(m, a),
-            reversed(self._matrices(angles)[:index + 1]),
-            np.array(p)
-        )[:3]
+        return np.dot(self.chain.pose(angles, index), p)[:3]
+
+    def reset(self, angles):
+        """Set the joint angles of the cached prefix and suffix transforms.
+
+        The i-th prefix is the frame of the i-th joint before its transform
+        and the i-th suffix is the transform from there to the end-effector,
+        so their product is the end-effector frame for any i. Changing a
+        single joint only invalidates the prefixes after it and the suffixes
+        up to it, which are then recomputed lazily in place, so sweeps do
+        not allocate new transforms.
+        """
+        n = len(self.chain)
+        dtype = self.chain.dtype
+        self._angles = np.array(angles, dtype=dtype)
+        self._prefixes = np.empty((n + 1, 4, 4), dtype=dtype)
+        self._suffixes = np.empty((n + 1, 4, 4), dtype=dtype)
+        self._scratch = np.empty((4, 4), dtype=dtype)
+        self._prefixes[0] = self.chain.constants[0]
+        self._suffixes[n] = np.eye(4)
+        self._prefix_valid = 0
+        self._suffix_valid = n
+
+    def update(self, index, angle):
+        """Change a single cached joint angle."""
+        self._angles[index] = angle
+        self._prefix_valid = min(self._prefix_valid, index)
+        self._suffix_valid = max(self._suffix_valid, index + 1)
+
+    def prefix(self, index):
+        """Return the cached frame of a joint before its transform."""
+        for i in range(self._prefix_valid, index):
+            np.dot(self._prefixes[i],
+                   self.chain.transform(i, self._angles[i]),
+                   out=self._scratch)
+            np.dot(self._scratch, self.chain.constants[i + 1],
+                   out=self._prefixes[i + 1])
+        self._prefix_valid = max(self._prefix_valid, index)
+        return self._prefixes[index]
+
+    def suffix(self, index):
+        """Return the cached transform from a joint to the end-effector."""
+        for i in reversed(range(index, self._suffix_valid)):
+            np.dot(self.chain.constants[i + 1], self._suffixes[i + 1],
+                   out=self._scratch)
+            np.dot(self.chain.transform(i, self._angles[i]), self._scratch,
+                   out=self._suffixes[i])
+        self._suffix_valid = min(self._suffix_valid, index)
+        return self._suffixes[index]
 
+    def joint(self, index):
+        """Return the cached position and axis of a joint."""
+        m = self.prefix(index)
+        return m[:3, 3], np.dot(m[:3, :3], self.chain.axis(index))
 
-class CCDIKSolver(object):
+    def end_effector(self):
+        """Return the cached position of the end-effector."""
+        if self._prefix_valid >= self._suffix_valid:
+            i = self._suffix_valid
+            return np.dot(self._prefixes[i], self._suffixes[i][:, 3])[:3]
+        i = self._prefix_valid
+        return np.dot(self._prefixes[i], self.suffix(i)[:, 3])[:3]
 
-    def __init__(self, fk_solver, tol=1.48e-08, maxiter=50):
+
+class CCDIKSolver(Instrumented):
+
+    def __init__(self, fk_solver, tol=1.48e-08, maxiter=50, policy=None):
+        super(CCDIKSolver, self).__init__()
         self._fk_solver = fk_solver
         self.tol = tol
         self.maxiter = maxiter
+        self.policy = ConvergencePolicy() if policy is None else policy
 
-    def solve(self, angles0, target):
-        joint_indexes = list(reversed(self._fk_solver.joint_indexes))
-        angles = angles0[:]
-        pmap = {
-            'x': [1., 0., 0., 0.],
-            'y': [0., 1., 0., 0.],
-            'z': [0., 0., 1., 0.]}
+    def solve(self, angles0, target, maxiter=None, deadline=None):
+        stats = self.begin_stats()
+        fk = self._fk_solver
+        lower, upper = fk.limits
+        angles = np.clip(np.array(angles0, dtype=float), lower, upper)
+        target = np.asarray(target, dtype=float)
+        fk.reset(angles)
         prev_dist = sys.float_info.max
-        for _ in range(self.maxiter):
-            for i, idx in enumerate(joint_indexes):
-                axis = self._fk_solver.solve(
-                    angles,
-                    p=pmap[self._fk_solver.components[idx].axis],
-                    index=idx)
-                pj = self._fk_solver.solve(angles, index=idx)
-                ee = self._fk_solver.solve(angles)
-                eorp = self.p_on_rot_plane(ee, pj, axis)
-                torp = self.p_on_rot_plane(target, pj, axis)
-                ve = (eorp - pj) / np.linalg.norm(eorp - pj)
-                vt = (torp - pj) / np.linalg.norm(torp - pj)
-                a = np.arccos(np.dot(vt, ve))
+        stats.status = 'maxiter'
+        monitor = self.policy.monitor(stats, deadline)
+        for _ in range(self.maxiter if maxiter is None else maxiter):
+            if monitor.exhausted():
+                break
+            stats.iterations += 1
+            for i in reversed(range(len(angles))):
+                with stats.phase('fk'):
+                    pj, axis = fk.joint(i)
+                    ee = fk.end_effector()
+                stats.nfev += 1
+                if fk.chain.prismatic[i]:
+                    # Slide to the point on the axis line nearest the target.
+                    step = np.dot(target - ee, axis)
+                    angles[i] = np.clip(angles[i] + step, lower[i], upper[i])
+                    fk.update(i, angles[i])
+                    continue
+                eorp = self.p_on_rot_plane(ee, pj, axis) - pj
+                torp = self.p_on_rot_plane(target, pj, axis) - pj
+                ne, nt = np.linalg.norm(eorp), np.linalg.norm(torp)
+                if ne < self.tol or nt < self.tol:
+                    continue
+                ve, vt = eorp / ne, torp / nt
+                a = np.arccos(np.clip(np.dot(vt, ve), -1., 1.))
                 sign = 1 if np.dot(axis, np.cross(ve, vt)) > 0 else -1
-                angles[-(i + 1)] += (a * sign)
+                angles[i] = np.clip(angles[i] + a * sign, lower[i], upper[i])
+                fk.update(i, angles[i])
 
-            ee = self._fk_solver.solve(angles)
-            dist = np.linalg.norm(target - ee)
+            with stats.phase('fk'):
+                dist = np.linalg.norm(target - fk.end_effector())
+            stats.nfev += 1
+            if monitor.converged(dist):
+                break
             delta = prev_dist - dist
             if delta < self.tol:
+                stats.status = 'tol'
                 break
             prev_dist = dist
 
+        with stats.phase('fk'):
+            stats.residual = np.linalg.norm(target - fk.end_effector())
+        stats.success = stats.status in ('tol', 'residual')
+        self.end_stats()
         return angles
 
     def p_on_rot_plane(self, p, joint_pos, joint_axis):
         ua = joint_axis / np.linalg.norm(joint_axis)
         return p - (np.dot(p - joint_pos, ua) * ua)
+
+
+class FABRIKSolver(Instrumented):
+    """An IK solver based on FABRIK (Forward And Backward Reaching IK).
+
+    Every iteration works on the positions of the joints and the
+    end-effector. A forward pass drags them from the end-effector to the
+    target keeping the distances between them, and a backward pass from the
+    base sets each joint to the angle, or the displacement, which brings the
+    nearest next position its axis moves closest to the forward pass, so
+    the positions stay those of the chain and convert back to angles within
+    the limits. Only end-effector positions can be targets.
+    """
+
+    def __init__(self, fk_solver, tol=1e-6, maxiter=50, policy=None):
+        """Generate an IK solver from a FK solver instance."""
+        super(FABRIKSolver, self).__init__()
+        self._fk_solver = fk_solver
+        self.tol = tol
+        self.maxiter = maxiter
+        self.policy = ConvergencePolicy() if policy is None else policy
+
+    def solve(self, angles0, target, maxiter=None, deadline=None):
+        """Calculate joint angles and returns it.
+
+        If maxiter or deadline, an absolute time.perf_counter() value, is
+        given, it stops there and may return a partial solution.
+        """
+        stats = self.begin_stats()
+        chain = self._fk_solver.chain
+        angles = np.clip(np.array(angles0, dtype=float),
+                         chain.lower, chain.upper)
+        target = self._target(target)
+        stats.status = 'maxiter'
+        monitor = self.policy.monitor(stats, deadline)
+        positions, axes = self._positions(angles)
+        for _ in range(self.maxiter if maxiter is None else maxiter):
+            if monitor.exhausted():
+                break
+            stats.iterations += 1
+            with stats.phase('solve'):
+                reached = self._forward(positions, target)
+                self._backward(angles, positions, axes, reached)
+            # Recalculated rather than carried over, so that rounding errors
+            # of the backward passes do not accumulate.
+            positions, axes = self._positions(angles)
+            dist = np.linalg.norm(target - positions[-1])
+            if dist <= self.tol:
+                stats.status = 'tol'
+                break
+            if monitor.converged(dist):
+                break
+
+        stats.residual = np.linalg.norm(target - positions[-1])
+        stats.success = stats.status in ('tol', 'residual')
+        self.end_stats()
+        return angles
+
+    def error(self, angles, target):
+        """Calculate the distance of the end-effector from a target."""
+        return np.linalg.norm(
+            self._fk_solver.solve(angles) - self._target(target))
+
+    def solve_many(self, targets, angles0=None, warm_start=True):
+        """Calculate joint angles for a sequence of targets and return them.
+
+        Each solve starts from the previous solution if warm_start is true,
+        or from angles0 otherwise. If angles0 has a row per target, each row
+        seeds its own solve instead. Along with the angles, it returns flags
+        telling whether each target is reached within tol.
+        """
+        targets = np.array([self._target(t) for t in targets])
+        if angles0 is None:
+            angles0 = np.zeros(len(self._fk_solver.joint_indexes))
+        angles = _solve_many(self.solve, targets, angles0, warm_start)
+        if not len(targets):
+            return angles, np.zeros(0, dtype=bool)
+        errors = np.linalg.norm(
+            self._fk_solver.solve_batch(angles) - targets, axis=1)
+        return angles, errors <= self.tol
+
+    def _target(self, target):
+        target = np.asarray(target, dtype=float)
+        if target.shape != (3,):
+            raise ValueError(
+                'FABRIK needs an end-effector position: {}'.format(target))
+        return target
+
+    def _positions(self, angles):
+        # The positions of the joints followed by that of the end-effector,
+        # and the joint axes in the base frame.
+        self.stats.nfev += 1
+        chain = self._fk_solver.chain
+        with self.stats.phase('fk'):
+            prefixes = chain.prefixes(angles)
+            positions, axes = chain._joints(np, prefixes)
+            ee = np.dot(prefixes[-1], chain.constants[-1])[:3, 3]
+        return (np.concatenate([positions, ee[None]]).astype(float),
+                axes.astype(float))
+
+    def _forward(self, positions, target):
+        # Plain floats are faster than NumPy for points one by one.
+        lengths = np.sqrt(np.sum(np.diff(positions, axis=0) ** 2, axis=1))
+        x, y, z = target
+        reached = [(x, y, z)]
+        for (px, py, pz), length in zip(positions[-2::-1].tolist(),
+                                        lengths[::-1].tolist()):
+            dx, dy, dz = px - x, py - y, pz - z
+            norm = math.sqrt(dx * dx + dy * dy + dz * dz)
+            if norm > 0.:
+                x += dx * length / norm
+                y += dy * length / norm
+                z += dz * length / norm
+            reached.append((x, y, z))
+        return np.array(reached[::-1])
+
+    def _backward(self, angles, positions, axes, reached):
+        # Moves the joints in order from the base, rotating the following
+        # positions and axes after each joint as the chain does. A joint
+        # takes the rotation best fitting the following positions u to
+        # those of the forward pass v, both relative to the joint, weighted
+        # by their order so that those toward the end-effector count more.
+        # Its sine and cosine parts are sums of w (a x u).v and
+        # w (a x u).(a x v) for the axis a.
+        chain = self._fk_solver.chain
+        lower, upper = chain.lower, chain.upper
+        n = len(axes)
+        weights = np.arange(1., n + 1.)[:, None]
+        for i in range(n):
+            a, p = axes[i], positions[i]
+            if chain.prismatic[i]:
+                step = np.dot(reached[i + 1] - positions[i + 1], a)
+                angle = min(max(angles[i] + step, lower[i]), upper[i])
+                positions[i + 1:] += (angle - angles[i]) * a
+                angles[i] = angle
+                continue
+            u = positions[i + 1:] - p
+            (m00, m01, m02), (m10, m11, m12), (m20, m21, m22) = np.dot(
+                (weights[:n - i] * u).T, reached[i + 1:] - p).tolist()
+            x, y, z = a.tolist()
+            sin = x * (m12 - m21) + y * (m20 - m02) + z * (m01 - m10)
+            cos = m00 + m11 + m22 - (
+                x * (x * m00 + y * m01 + z * m02) +
+                y * (x * m10 + y * m11 + z * m12) +
+                z * (x * m20 + y * m21 + z * m22))
+            if math.hypot(sin, cos) < 1e-12:
+                continue  # the following positions are all on the axis
+            angle = min(max(angles[i] + math.atan2(sin, cos), lower[i]),
+                        upper[i])
+            if angle == angles[i]:
+                continue
+            c, s = math.cos(angle - angles[i]), math.sin(angle - angles[i])
+            t = 1. - c
+            # The transposed rotation, which multiplies rows of vectors.
+            r = np.array([
+                [c + t * x * x, t * x * y + s * z, t * x * z - s * y],
+                [t * x * y - s * z, c + t * y * y, t * y * z + s * x],
+                [t * x * z + s * y, t * y * z - s * x, c + t * z * z]])
+            positions[i + 1:] = np.dot(u, r) + p
+            axes[i + 1:] = np.dot(axes[i + 1:], r)
+            angles[i] = angle
@@ -0,0 +1,83 @@
+"""Statistics of solves."""
+
+from contextlib import contextmanager
+import time
+
+
+class SolveStats(object):
+    """Statistics of a single solve.
+
+    It records the number of iterations, objective evaluations (nfev) and
+    Jacobian or gradient evaluations (njev), the norm of the final residual,
+    the status telling what ended the solve, whether it succeeded, and the
+    seconds spent in total (time) and per phase (times), such as 'fk',
+    'gradient' and 'solve' for linear solves. Solvers built on a library
+    also keep its message and raw result.
+    """
+
+    def __init__(self):
+        """Create empty statistics and start the clock."""
+        self.iterations = 0
+        self.nfev = 0
+        self.njev = 0
+        self.residual = None
+        self.status = None
+        self.success = False
+        self.message = None
+        self.result = None
+        self.time = 0.
+        self.times = {}
+        self._start = time.perf_counter()
+
+    def __repr__(self):
+        return (
+            'SolveStats(iterations={}, nfev={}, njev={}, residual={}, '
+            'status={!r}, success={}, time={:.6f}, times={})'.format(
+                self.iterations, self.nfev, self.njev, self.residual,
+                self.status, self.success, self.time, self.times))
+
+    @contextmanager
+    def phase(self, name):
+        """Add the time spent in a block to a phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = (self.times.get(name, 0.) +
+                                time.perf_counter() - start)
+
+    def finish(self):
+        """Stop the clock."""
+        self.time = time.perf_counter() - self._start
+
+
+class Instrumented(object):
+    """A base class of solvers recording statistics of every solve.
+
+    The statistics of the last solve are in stats, and each hook is called
+    with them after every solve.
+    """
+
+    def __init__(self):
+        """Start with no statistics and no hooks."""
+        self.stats = None
+        self.hooks = []
+
+    def add_hook(self, hook):
+        """Register a callable to be called with every SolveStats."""
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """Unregister a callable."""
+        self.hooks.remove(hook)
+
+    def begin_stats(self):
+        """Start recording statistics of a new solve."""
+        self.stats = SolveStats()
+        return self.stats
+
+    def end_stats(self):
+        """Finish recording statistics and pass them to the hooks."""
+        self.stats.finish()
+        for hook in self.hooks:
+            hook(self.stats)
@@ -0,0 +1,225 @@
+"""Saving and loading actuators with their solver state.
+
+An actuator is saved to a directory holding actuator.json, which describes
+the chain and the IK solver with its optimizer, and a .npy file per array: the
+joint angles, and the voxels and seeds of a workspace and the entries of a
+solution cache if the IK solver has them. The arrays are loaded as
+read-only memory maps by default, so processes loading the same directory
+share a single copy of them through the page cache.
+
+Saving writes a new directory next to the old one and then swaps them, so a
+directory always holds the files of a single save, and arrays mapped from
+the old files stay valid.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from .cache import SolutionCache
+from .component import Link, Joint, PrismaticJoint
+from .convergence import ConvergencePolicy
+from .optimizer import (
+    NewtonOptimizer, SteepestDescentOptimizer, ConjugateGradientOptimizer,
+    DampedLeastSquaresOptimizer, NullSpaceOptimizer, ScipyOptimizer,
+    ScipySmoothOptimizer
+)
+from .solver import IKSolver, FABRIKSolver
+from .workspace import Workspace
+
+
+version = 1
+
+_optimizers = {
+    'NewtonOptimizer': (NewtonOptimizer, ('tol', 'maxiter')),
+    'SteepestDescentOptimizer': (
+        SteepestDescentOptimizer, ('tol', 'maxiter', 'alpha')),
+    'ConjugateGradientOptimizer': (
+        ConjugateGradientOptimizer, ('tol', 'maxiter')),
+    'DampedLeastSquaresOptimizer': (
+        DampedLeastSquaresOptimizer,
+        ('tol', 'maxiter', 'damping', 'factor', 'max_step')),
+    'NullSpaceOptimizer': (
+        NullSpaceOptimizer,
+        ('tol', 'maxiter', 'damping', 'factor', 'max_step', 'centering',
+         'smooth_factor', 'manipulability')),
+    'ScipyOptimizer': (ScipyOptimizer, ()),
+    'ScipySmoothOptimizer': (ScipySmoothOptimizer, ('smooth_factor',)),
+}
+
+
+def _plain(value):
+    # Convert NumPy values for JSON.
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError('cannot be saved: {!r}'.format(value))
+
+
+def _component(c):
+    if isinstance(c, Joint):
+        return {
+            'type': 'prismatic' if c.prismatic else 'joint',
+            'axis': c.axis if isinstance(c.axis, str) else c.vector,
+            'limits': c.limits}
+    return {'type': 'link', 'coord': c.coord}
+
+
+def _build_component(d):
+    if d['type'] == 'link':
+        return Link(d['coord'])
+    joint = PrismaticJoint if d['type'] == 'prismatic' else Joint
+    return joint(d['axis'], d['limits'])
+
+
+def _optimizer(optimizer):
+    name = type(optimizer).__name__
+    if _optimizers.get(name, (None,))[0] is not type(optimizer):
+        raise ValueError('the optimizer cannot be saved: {}'.format(name))
+    params = {k: getattr(optimizer, k) for k in _optimizers[name][1]}
+    if isinstance(optimizer, ScipyOptimizer):
+        params.update(optimizer.optimizer_opt)
+    return {'type': name, 'params': params,
+            'policy': vars(optimizer.policy)}
+
+
+def _build_optimizer(d):
+    if d['type'] not in _optimizers:
+        raise ValueError('unknown optimizer: {}'.format(d['type']))
+    policy = None
+    if d.get('policy') is not None:
+        policy = ConvergencePolicy(**d['policy'])
+    return _optimizers[d['type']][0](policy=policy, **d['params'])
+
+
+def _swap(source, path):
+    # Move the directory source to path, removing what was there.
+    if not os.path.exists(path):
+        os.rename(source, path)
+        return
+    old = tempfile.mkdtemp(dir=os.path.dirname(path))
+    os.rename(path, old)  # onto the empty directory
+    os.rename(source, path)
+    shutil.rmtree(old)
+
+
+def save(actuator, path):
+    """Save an actuator and the state of its IK solver to a directory.
+
+    The directory is replaced as a whole, so it should hold nothing else.
+    """
+    ik = actuator.ik
+    arrays = {'angles': actuator.angles}
+    description = {
+        'version': version,
+        'dtype': actuator.fk.chain.dtype.name,
+        'components': [_component(c) for c in actuator.components],
+        'solver': None,
+        'optimizer': None,
+        'ik': None,
+        'workspace': None,
+        'cache': None,
+    }
+    if isinstance(ik, FABRIKSolver):
+        description['solver'] = 'fabrik'
+        description['ik'] = {
+            'tol': ik.tol,
+            'maxiter': ik.maxiter,
+            'policy': vars(ik.policy),
+        }
+    else:
+        description['optimizer'] = _optimizer(ik.optimizer)
+        description['ik'] = {
+            'tol': ik.tol,
+            'frames': ik.frames,
+            'weights': ik.weights,
+            'orientation_weight': ik.orientation_weight,
+        }
+    if getattr(ik, 'workspace', None) is not None:
+        description['workspace'] = {'voxel_size': ik.workspace.voxel_size}
+        arrays['workspace_voxels'] = ik.workspace.voxels
+        arrays['workspace_seeds'] = ik.workspace.seeds
+    if getattr(ik, 'cache', None) is not None:
+        description['cache'] = {
+            'maxsize': ik.cache.maxsize, 'radius': ik.cache.radius}
+        keys, positions, angles = ik.cache.entries()
+        lengths = np.array([len(k) for k in keys], dtype=int)
+        buffer = np.zeros((len(keys), max(lengths, default=0)), np.uint8)
+        for row, key in zip(buffer, keys):
+            row[:len(key)] = np.frombuffer(key, np.uint8)
+        arrays.update(cache_keys=buffer, cache_key_lengths=lengths,
+                      cache_positions=positions, cache_angles=angles)
+
+    # Serialized first, so that an invalid description writes nothing.
+    text = json.dumps(description, indent=2, default=_plain)
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+    temporary = tempfile.mkdtemp(
+        prefix='.' + os.path.basename(path) + '.', dir=parent)
+    try:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temporary, 0o777 & ~umask)  # not only for the owner
+        for name, array in arrays.items():
+            np.save(os.path.join(temporary, name + '.npy'),
+                    np.asarray(array))
+        with open(os.path.join(temporary, 'actuator.json'), 'w') as f:
+            f.write(text)
+        _swap(temporary, path)
+    except BaseException:
+        shutil.rmtree(temporary, ignore_errors=True)
+        raise
+
+
+def load(path, mmap_mode='r'):
+    """Load an actuator saved by save from a directory.
+
+    The arrays of the workspace and the cache are memory-mapped with
+    mmap_mode, or read into memory if it is None.
+    """
+    from .core import Actuator
+
+    with open(os.path.join(path, 'actuator.json')) as f:
+        description = json.load(f)
+    if description.get('version') != version:
+        raise ValueError(
+            'unsupported version: {}'.format(description.get('version')))
+
+    def array(name):
+        return np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode)
+
+    components = [_build_component(d) for d in description['components']]
+    dtype = np.dtype(description['dtype'])
+    if description.get('solver') == 'fabrik':
+        actuator = Actuator(components, dtype=dtype, solver='fabrik')
+        actuator.angles = np.load(os.path.join(path, 'angles.npy'))
+        params = dict(description['ik'])
+        params['policy'] = ConvergencePolicy(**params['policy'])
+        actuator.ik = FABRIKSolver(actuator.fk, **params)
+        return actuator
+
+    optimizer = _build_optimizer(description['optimizer'])
+    actuator = Actuator(components, optimizer=optimizer, dtype=dtype)
+    actuator.angles = np.load(os.path.join(path, 'angles.npy'))
+
+    workspace = None
+    if description['workspace'] is not None:
+        workspace = Workspace(
+            description['workspace']['voxel_size'],
+            array('workspace_voxels'), array('workspace_seeds'))
+    cache = None
+    if description['cache'] is not None:
+        cache = SolutionCache(**description['cache'])
+        keys = np.load(os.path.join(path, 'cache_keys.npy'))
+        lengths = np.load(os.path.join(path, 'cache_key_lengths.npy'))
+        positions, angles = array('cache_positions'), array('cache_angles')
+        for key, n, p, a in zip(keys, lengths, positions, angles):
+            cache.put(key[:n].tobytes(), p, a, copy=False)
+    actuator.ik = IKSolver(
+        actuator.fk, optimizer, cache=cache, workspace=workspace,
+        **description['ik'])
+    return actuator
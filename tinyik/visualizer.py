@@ -1,9 +1,14 @@
-import numpy as np
+"""Visualization of actuators with open3d.
+
+Meshes are built once per shape and size as templates, and each component
+of an actuator gets a copy placed in its own frame. Moving the actuator only
+rewrites the vertices of the copies from the poses of the components, which
+are calculated for whole trajectories in one batched pass.
+"""
 
-try:
-    import open3d as o3d  # the extra feature
-except ImportError:
-    pass
+import time
+
+import numpy as np
 
 
 def translate(p):
@@ -38,148 +43,191 @@ def rotate(axis, angle):
         ])
 
 
-def create_sphere(p, radius, color=None):
-    if color is None:
-        color = [.8, .8, .8]
-    geo = o3d.geometry.TriangleMesh.create_sphere(radius=radius)
-    geo.compute_vertex_normals()
-    geo.paint_uniform_color(color)
-    geo.transform(translate(p))
-    return geo
-
-
-class GeoComponent:
-
-    child = None
-    radius = .1
-
-    def tip(self, link_color=None):
-        return create_sphere(
-            [0., 0., 0.],
-            radius=self.radius*2,
-            color=[.8, .8, .8] if link_color is None else link_color)
-
-    def geo(self, mat=None, link_color=None):
-        geo = self.base_geo(link_color)
-        if mat is not None:
-            geo.transform(mat)
-            mat = mat @ self.mat()
-        else:
-            mat = self.mat()
-        if self.child is None:
-            return [geo] + [self.tip(link_color).transform(mat)]
-        else:
-            return [geo] + self.child.geo(mat, link_color)
-
-
-class Link(GeoComponent):
-
-    def __init__(self, c, radius):
-        self.c = c
-        self.radius = radius
-
-    def base_geo(self, link_color=None):
-        norm = np.linalg.norm(self.c.coord)
+def align(direction):
+    """Return a rotation taking the z-axis to a direction."""
+    d = np.asarray(direction, dtype=float)
+    d = d / np.linalg.norm(d)
+    axis = np.cross([0., 0., 1.], d)
+    norm = np.linalg.norm(axis)
+    if norm < 1e-12:
+        return np.eye(4) if d[2] > 0 else rotate([1., 0., 0.], np.pi)
+    return rotate(axis / norm, np.arctan2(norm, d[2]))
 
-        geo = o3d.geometry.TriangleMesh.create_cylinder(
-            radius=self.radius, height=norm)
-        geo.compute_vertex_normals()
-        geo.paint_uniform_color(
-            [.8, .8, .8] if link_color is None else link_color)
 
-        # Calculate transformation matrix for cylinder
-        # With help from https://stackoverflow.com/a/59829173
-        def get_cross_prod_mat(vector):
-            return np.array([
-                [0, -vector[2], vector[1]],
-                [vector[2], 0, -vector[0]],
-                [-vector[1], vector[0], 0],
-            ])
-        cylinder_dir_unit_vector = self.c.coord / norm
+def component_poses(actuator, trajectory):
+    """Return the poses of the components of an actuator over a trajectory.
 
-        # Unit vector for "up" direction
-        z_unit_vector = np.array([0, 0, 1])
-        z_rotation_mat = get_cross_prod_mat(z_unit_vector)
+    For each row of joint angles, there are the frames just before each
+    component followed by the frame of the end-effector, so the array has
+    the shape (N, len(actuator.components) + 1, 4, 4).
+    """
+    trajectory = np.reshape(
+        np.asarray(trajectory, dtype=float), (-1, len(actuator.angles)))
+    after = actuator.fk.poses_batch(
+        trajectory, np.arange(len(actuator.components)))
+    before = np.broadcast_to(np.eye(4), (len(trajectory), 1, 4, 4))
+    return np.concatenate([before, after], axis=1)
 
-        z_c_vec = np.matmul(z_rotation_mat, cylinder_dir_unit_vector)
-        z_c_vec_mat = get_cross_prod_mat(z_c_vec)
 
-        # Added np.abs to ensure that unit vector that is aligned with any
-        # axis in the negative direction does not
-        rotation_mat = np.eye(3, 3) + z_c_vec_mat + np.matmul(
-            z_c_vec_mat, z_c_vec_mat)/(
-                (1 + np.abs(np.dot(z_unit_vector, cylinder_dir_unit_vector))))
+_templates = {}
 
-        cylinder_transform_mat = np.vstack((np.hstack(
-            (rotation_mat, np.transpose(
-                np.array([self.c.coord])/2))), np.array([0, 0, 0, 1])))
 
-        geo.transform(cylinder_transform_mat)
-        return geo
-
-    def mat(self):
-        return self.c.matrix(None)
-
-
-class Joint(GeoComponent):
-
-    def __init__(self, c, radius):
-        self.c = c
-        self.radius = radius
-        self.angle = 0.
-
-    def base_geo(self, _=None):
-        geo = o3d.geometry.TriangleMesh.create_cylinder(
-            radius=self.radius*2, height=self.radius*4)
-        geo.compute_vertex_normals()
-        geo.paint_uniform_color([.2, .2, .9])
-        rx = {
-            'x': [0., 1., 0.],
-            'y': [1., 0., 0.],
-            'z': [0., 0., 1.],
-        }
-        geo.transform(rotate(rx[self.c.axis], np.pi / 2))
-        return geo
-
-    def mat(self):
-        return self.c.matrix(self.angle)
-
-
-def build_geos(actuator, target=None, radius=.05):
-    root = None
-    p = None
-    joints = []
-    for c in actuator.components:
-        if hasattr(c, 'axis'):
-            gc = Joint(c, radius)
-            joints.append(gc)
-        else:
-            gc = Link(c, radius)
-
-        if root is None:
-            root = gc
-            p = gc
+def _template(o3d, shape, radius):
+    # A unit height cylinder centered on the origin along the z-axis or a
+    # sphere, shared by every mesh of the same shape and radius.
+    key = shape, radius
+    if key not in _templates:
+        if shape == 'cylinder':
+            mesh = o3d.geometry.TriangleMesh.create_cylinder(
+                radius=radius, height=1.)
         else:
-            p.child = gc
-            p = gc
-
-    for j, a in zip(joints, actuator.angles):
-        j.angle = a
+            mesh = o3d.geometry.TriangleMesh.create_sphere(radius=radius)
+        mesh.compute_vertex_normals()
+        _templates[key] = mesh
+    return _templates[key]
+
+
+class _Mesh(object):
+    # A copy of a template placed by a local transform in a frame. Scaling
+    # a cylinder along its axis leaves its normals as they are.
+
+    def __init__(self, o3d, template, local, color, frame):
+        self.geometry = o3d.geometry.TriangleMesh(template)
+        self.geometry.paint_uniform_color(color)
+        self.frame = frame
+        self._vertices = (np.dot(np.asarray(template.vertices),
+                                 local[:3, :3].T) + local[:3, 3])
+        rotation = local[:3, :3] / np.linalg.norm(local[:3, :3], axis=0)
+        self._normals = np.dot(np.asarray(template.vertex_normals),
+                               rotation.T)
+
+    def place(self, pose):
+        # The arrays share memory with the geometry, which is updated in place.
+        np.asarray(self.geometry.vertices)[...] = (
+            np.dot(self._vertices, pose[:3, :3].T) + pose[:3, 3])
+        np.asarray(self.geometry.vertex_normals)[...] = np.dot(
+            self._normals, pose[:3, :3].T)
+
+
+class Scene(object):
+    """Meshes of an actuator which follow its joint angles.
+
+    With target set, a sphere shows a target position as well.
+    """
+
+    def __init__(self, actuator, radius=.05, link_color=None, target=False):
+        """Build the meshes of an actuator from the templates."""
+        import open3d as o3d  # the extra feature, imported on use
+        link_color = [.8, .8, .8] if link_color is None else link_color
+        self.actuator = actuator
+        self.meshes = []
+        for i, c in enumerate(actuator.components):
+            if hasattr(c, 'axis'):
+                local = np.dot(align(c.vector), np.diag(
+                    [1., 1., radius * 4., 1.]))
+                self.meshes.append(_Mesh(
+                    o3d, _template(o3d, 'cylinder', radius * 2.), local,
+                    [.2, .2, .9], i))
+            elif np.linalg.norm(c.coord) > 0.:
+                norm = np.linalg.norm(c.coord)
+                local = np.dot(np.dot(translate(np.divide(c.coord, 2.)),
+                                      align(c.coord)),
+                               np.diag([1., 1., norm, 1.]))
+                self.meshes.append(_Mesh(
+                    o3d, _template(o3d, 'cylinder', radius), local,
+                    link_color, i))
+        self.meshes.append(_Mesh(
+            o3d, _template(o3d, 'sphere', radius * 2.), np.eye(4),
+            link_color, len(actuator.components)))
+        self.target = None
+        if target:
+            self.target = _Mesh(
+                o3d, _template(o3d, 'sphere', radius * 2.4), np.eye(4),
+                [.8, .2, .2], None)
+        self.place(actuator.angles)
+
+    @property
+    def geometries(self):
+        """The open3d geometries of the scene."""
+        return [m.geometry for m in self.meshes + [self.target]
+                if m is not None]
+
+    def poses(self, trajectory):
+        """Return the poses of the components over a trajectory."""
+        return component_poses(self.actuator, trajectory)
+
+    def place(self, angles, target=None, poses=None):
+        """Move the meshes to joint angles and the target sphere to target.
+
+        The poses of the angles may be given if already calculated.
+        """
+        if poses is None:
+            poses = self.poses(angles)[0]
+        for m in self.meshes:
+            m.place(poses[m.frame])
+        if target is not None and self.target is not None:
+            self.target.place(translate(target))
+
+    def mesh(self):
+        """Return all meshes merged into one."""
+        import open3d as o3d
+        merged = o3d.geometry.TriangleMesh()
+        for g in self.geometries:
+            merged += g
+        return merged
 
-    if target:
-        geos = root.geo(link_color=[.5, .5, .5])
-        actuator.ee = target
-        for j, a in zip(joints, actuator.angles):
-            j.angle = a
-        geos += root.geo()
-        geos += [create_sphere(target, radius=radius*2.4, color=[.8, .2, .2])]
-    else:
-        geos = root.geo()
 
-    return geos
+def build_geos(actuator, target=None, radius=.05):
+    if target is None:
+        return Scene(actuator, radius).geometries
+    before = Scene(actuator, radius, link_color=[.5, .5, .5])
+    actuator.ee = target
+    after = Scene(actuator, radius, target=True)
+    after.place(actuator.angles, target)
+    return before.geometries + after.geometries
 
 
 def visualize(actuator, target=None, radius=.05):
+    import open3d as o3d
     geos = build_geos(actuator, target, radius)
     o3d.visualization.draw_geometries(
         geos, window_name='tinyik vizualizer', width=640, height=480)
+
+
+def animate(actuator, trajectory, targets=None, radius=.05, fps=30.):
+    """Play rows of joint angles, and optionally targets, in a window.
+
+    Only the vertices of the meshes are updated between frames.
+    """
+    import open3d as o3d
+    scene = Scene(actuator, radius, target=targets is not None)
+    poses = scene.poses(trajectory)
+    vis = o3d.visualization.Visualizer()
+    vis.create_window(window_name='tinyik vizualizer', width=640, height=480)
+    for g in scene.geometries:
+        vis.add_geometry(g)
+    for i, frame in enumerate(poses):
+        start = time.perf_counter()
+        scene.place(None, None if targets is None else targets[i], frame)
+        for g in scene.geometries:
+            vis.update_geometry(g)
+        vis.poll_events()
+        vis.update_renderer()
+        time.sleep(max(0., 1. / fps - (time.perf_counter() - start)))
+    vis.destroy_window()
+
+
+def export_frames(actuator, trajectory, path, targets=None, radius=.05):
+    """Write a mesh file per row of joint angles without opening a window.
+
+    The path is a format string such as 'frame{:04d}.ply', formatted with
+    the frame number. It returns the paths written.
+    """
+    import open3d as o3d
+    scene = Scene(actuator, radius, target=targets is not None)
+    paths = []
+    for i, frame in enumerate(scene.poses(trajectory)):
+        scene.place(None, None if targets is None else targets[i], frame)
+        paths.append(path.format(i))
+        o3d.io.write_triangle_mesh(paths[-1], scene.mesh())
+    return paths
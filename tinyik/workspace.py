@@ -0,0 +1,94 @@
+"""Reachability maps of actuators."""
+
+import itertools
+
+import numpy as np
+
+
+class Workspace(object):
+    """A voxelized reachability map with a seed of joint angles per voxel.
+
+    A voxel is reachable if some sampled joint angles put the end-effector
+    in it, and its seed is the sample closest to the voxel center.
+    """
+
+    def __init__(self, voxel_size, voxels, seeds):
+        """Create a workspace from voxel indexes and their seeds."""
+        self.voxel_size = voxel_size
+        self.voxels = np.asarray(voxels, dtype=int).reshape(-1, 3)
+        self.seeds = np.asarray(seeds, dtype=float)
+        self._index = {tuple(v): i for i, v in enumerate(self.voxels)}
+
+    def __len__(self):
+        """Return the number of reachable voxels."""
+        return len(self.voxels)
+
+    @classmethod
+    def sample(cls, fk_solver, voxel_size, samples=100000, batch=10000,
+               random_state=None):
+        """Build a workspace by sampling joint angles uniformly.
+
+        The angles are drawn within the joint limits, or a full turn for
+        joints without them.
+        """
+        rs = np.random.RandomState(random_state)
+        lower, upper = fk_solver.chain.ranges()
+        voxels = np.empty((0, 3), dtype=int)
+        seeds = np.empty((0, len(lower)))
+        for start in range(0, samples, batch):
+            angles = rs.uniform(
+                lower, upper, (min(batch, samples - start), len(lower)))
+            voxels, seeds = cls._merge(
+                fk_solver, voxel_size, np.concatenate([seeds, angles]))
+        return cls(voxel_size, voxels, seeds)
+
+    @staticmethod
+    def _merge(fk_solver, voxel_size, angles):
+        positions = fk_solver.solve_batch(angles)
+        voxels = np.floor(positions / voxel_size).astype(int)
+        distances = np.linalg.norm(
+            positions - (voxels + .5) * voxel_size, axis=1)
+        _, groups = np.unique(voxels, axis=0, return_inverse=True)
+        groups = np.ravel(groups)
+        order = np.lexsort((distances, groups))
+        first = order[np.r_[True, groups[order][1:] != groups[order][:-1]]]
+        return voxels[first], angles[first]
+
+    def voxel(self, position):
+        """Return the index of the voxel containing a position."""
+        return tuple(int(c) for c in np.floor(
+            np.asarray(position, dtype=float) / self.voxel_size))
+
+    def reachable(self, position):
+        """Tell whether a position is in or next to a reachable voxel."""
+        return self._nearest(position) is not None
+
+    def seed(self, position):
+        """Return the seed of the nearest reachable voxel, or None."""
+        i = self._nearest(position)
+        return None if i is None else self.seeds[i].copy()
+
+    def _nearest(self, position):
+        voxel = self.voxel(position)
+        if voxel in self._index:
+            return self._index[voxel]
+        best, best_distance = None, None
+        for offset in itertools.product((-1, 0, 1), repeat=3):
+            i = self._index.get(tuple(v + o for v, o in zip(voxel, offset)))
+            if i is not None:
+                distance = np.dot(offset, offset)
+                if best is None or distance < best_distance:
+                    best, best_distance = i, distance
+        return best
+
+    def save(self, path):
+        """Save the workspace to a .npz file."""
+        np.savez(path, voxel_size=self.voxel_size, voxels=self.voxels,
+                 seeds=self.seeds)
+
+    @classmethod
+    def load(cls, path):
+        """Load a workspace from a .npz file."""
+        with np.load(path) as data:
+            return cls(float(data['voxel_size']), data['voxels'],
+                       data['seeds'])